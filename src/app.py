@@ -1,14 +1,23 @@
 
+import time
 import streamlit as st
 from typing import List, Dict
-from generation.rag_chat import RAGChat
-from retrieval.retrieval_manager import RetrievalManager
+from utility import component_registry, metrics, warm_start
+
+# src/.env holds the metrics and warm start settings read below; loaded once per process, not on every rerun
+component_registry.load_env()
 
 st.set_page_config(page_title="RAG Chat", page_icon="💬", layout="centered")
 st.title("💬 Enterprise QnA")
 
 st.caption("A minimal UI for a RAG-powered chatbot for enterprise users.")
 
+# Serves /metrics when RAG_METRICS=true and RAG_METRICS_PORT are set; started once per process
+metrics.start_http_server()
+
+# With RAG_WARM_START=true, clients and connections are set up in the background while the page renders
+warm_start.start()
+
 # ---- Restart button ----
 if st.button("🔄 Start New Session", type="secondary"):
     st.session_state.clear()
@@ -18,11 +27,21 @@ if st.button("🔄 Start New Session", type="secondary"):
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# ---- RAG chat ----
+# Retrieval, embedding and chat clients are process-wide; the RAGChat (and its history) is per session.
+# It is created on the first question, so the page does not wait for the clients to be built
+def get_rag_chat():
+    if "rag_chat" not in st.session_state:
+        from generation.rag_chat import RAGChat
+        st.session_state.rag_chat = RAGChat(retrieval_manager=component_registry.get_retrieval_manager())
+    return st.session_state.rag_chat
+
 
 # ---- Display chat history ----
-for msg in st.session_state.messages:
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
+with metrics.timer("rag_ui_history_render_seconds"):
+    for msg in st.session_state.messages:
+        with st.chat_message(msg["role"]):
+            st.markdown(msg["content"])
 
 # ---- Chat input ----
 user_input = st.chat_input("Ask something about your enterprise policy...")
@@ -36,14 +55,14 @@ if user_input:
     # Display user message in chat message container
     st.chat_message("user").markdown(user_input)
 
-    # Get response from RAG Chat
-    rag_chat = RAGChat(retrieval_manager=RetrievalManager())
-    response = rag_chat.chat(user_input)
+    # Stream the response from RAG Chat into the assistant message container as it is generated
+    start = time.perf_counter()
+    with st.chat_message("assistant"):
+        response = st.write_stream(get_rag_chat().chat_stream(user_input))
+    # Whole turn as the user sees it, including writing tokens to the page
+    metrics.observe("rag_ui_turn_seconds", time.perf_counter() - start)
 
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": response})
-    
-    # Display bot response in chat message container
-    st.chat_message("assistant").markdown(response)
 
-    
\ No newline at end of file
+    
@@ -0,0 +1,150 @@
+import json
+import time
+import random
+import threading
+from urllib.parse import unquote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from retrieval.local_search_backend import LocalSearchBackend
+
+
+class _FakeSearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output quiet
+        pass
+
+    def setup(self):
+        super().setup()
+        # Once per connection, like a TLS handshake; kept-alive connections skip it
+        time.sleep(self.server.fake.connect_delay)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = unquote(self.path.split("?", 1)[0])
+        server: FakeSearchServer = self.server.fake
+        server.delay()
+
+        if path.endswith("/docs/search.post.search"):
+            select = body.get("select")
+            vector_queries = [
+                {"kind": query.get("kind"), "vector": query.get("vector"), "k": query.get("k"), "fields": query.get("fields")}
+                for query in body.get("vectorQueries") or []
+            ]
+            with server.lock:
+                hits = server.backend.search(
+                    search_text=body.get("search"),
+                    vector_queries=vector_queries or None,
+                    top=body.get("top"),
+                    select=select.split(",") if select else None,
+                    filter=body.get("filter")
+                )
+            server.count("search")
+            self._send_json(200, {"value": hits})
+        elif path.endswith("/docs/search.index"):
+            uploads, deletes = [], []
+            for action in body.get("value", []):
+                document = {key: value for key, value in action.items() if key != "@search.action"}
+                (deletes if action.get("@search.action") == "delete" else uploads).append(document)
+            with server.lock:
+                results = server.backend.upload_documents(uploads) if uploads else []
+                results += server.backend.delete_documents(deletes) if deletes else []
+            server.count("index")
+            self._send_json(200, {"value": [
+                {"key": result["key"], "status": True, "errorMessage": None, "statusCode": 200}
+                for result in results
+            ]})
+        else:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown path {path}"}})
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        path = unquote(path)
+        server: FakeSearchServer = self.server.fake
+        server.delay()
+
+        if path.endswith("/docs/$count"):
+            with server.lock:
+                count = server.backend.get_document_count()
+            self._send(200, str(count).encode("utf-8"), "text/plain")
+        elif "/docs('" in path:
+            key = path.split("/docs('", 1)[1].rsplit("')", 1)[0]
+            select = None
+            for parameter in query.split("&"):
+                if parameter.startswith("$select="):
+                    select = unquote(parameter[len("$select="):]).split(",")
+            try:
+                with server.lock:
+                    document = server.backend.get_document(key, select)
+            except KeyError:
+                self._send_json(404, {"error": {"code": "NotFound", "message": f"Document {key} not found"}})
+                return
+            self._send_json(200, document)
+        else:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown path {path}"}})
+
+    def _send_json(self, status: int, payload):
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json; odata.metadata=none")
+
+    def _send(self, status: int, data: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeSearchServer:
+    """
+    Local stand-in for an Azure AI Search index's REST endpoint.
+
+    Serves the document search, indexing and lookup calls that SearchClient
+    makes from a LocalSearchBackend, after an injected latency of
+    latency seconds plus up to jitter seconds (and connect_delay seconds per
+    new connection), so RetrievalManager and the local ingestion pipeline can
+    be benchmarked with the real Azure SDK client and no network access.
+    """
+
+    def __init__(self, backend: LocalSearchBackend, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, connect_delay: float = 0.0):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.connect_delay = connect_delay
+        # The local indexes are not safe for concurrent updates; the injected latency is applied outside the lock
+        self.lock = threading.Lock()
+        self.requests = {}
+        self._httpd = ThreadingHTTPServer((host, port), _FakeSearchHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.random() * self.jitter)
+
+    def count(self, kind: str):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def start(self) -> "FakeSearchServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
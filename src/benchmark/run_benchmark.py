@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+sys.path.append(str(Path(__file__).parent.parent))
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from openai import AzureOpenAI
+
+from benchmark.fake_search import FakeSearchServer
+from generation.rag_chat import RAGChat
+from ingestion.local_ingestion import LocalIngestionPipeline
+from retrieval.local_search_backend import LocalSearchBackend
+from retrieval.retrieval_manager import RetrievalManager, SearchType
+from utility.embedder import Embedder
+from utility.fake_openai import FakeOpenAIServer
+from utility.metrics import Histogram
+from utility.request_scheduler import RequestScheduler
+
+INDEX_NAME = "benchmark-index"
+# Higher is better for these; every other metric is a latency where lower is better
+THROUGHPUT_METRICS = {"ops_per_sec", "docs_per_sec", "chunks_per_sec"}
+
+
+def make_corpus(directory: str, documents: int, seed: int = 7) -> List[str]:
+    """Write synthetic documents and return the vocabulary they were drawn from."""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(2000)] + ["policy", "reimbursement", "travel", "leave", "benefits"]
+    os.makedirs(directory, exist_ok=True)
+    for i in range(documents):
+        sentences = []
+        for _ in range(rng.randint(40, 70)):
+            sentences.append(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 12))).capitalize() + ".")
+        with open(os.path.join(directory, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Document {i}. " + " ".join(sentences))
+    return vocabulary
+
+
+def measure(operation: Callable[[int], None], operations: int, concurrency: int) -> Dict[str, float]:
+    """
+    Run operation(i) for i in range(operations) on concurrency threads.
+
+    Returns:
+        Throughput, latency percentiles in milliseconds and the error count
+    """
+    histogram = Histogram(max_samples=operations)
+    errors = []
+
+    def timed(i: int):
+        start = time.perf_counter()
+        try:
+            operation(i)
+        except Exception as e:
+            errors.append(e)
+            return
+        histogram.observe(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(operations)))
+    elapsed = time.perf_counter() - start
+    if errors:
+        print(f"  {len(errors)} operations failed, first error: {errors[0]}")
+    quantiles = histogram.quantiles()
+    return {
+        "ops_per_sec": histogram.count / elapsed,
+        "p50_ms": quantiles[0.5] * 1000,
+        "p95_ms": quantiles[0.95] * 1000,
+        "p99_ms": quantiles[0.99] * 1000,
+        "errors": len(errors)
+    }
+
+
+def benchmark_ingestion(source_dir: str, work_dir: str, openai_endpoint: str, args, level: int) -> Dict[str, float]:
+    backend = LocalSearchBackend(os.path.join(work_dir, f"ingest_{level}"))
+    with FakeSearchServer(backend, latency=args.search_latency / 1000) as search_server:
+        search_client = SearchClient(search_server.endpoint, INDEX_NAME, AzureKeyCredential("fake-key"))
+        embedder = Embedder(endpoint=openai_endpoint, api_key="fake-key", scheduler=RequestScheduler("benchmark"))
+        embedder.max_concurrency = level
+        pipeline = LocalIngestionPipeline(source_dir, embedder, search_client, workers=args.workers,
+                                          report_every=10 ** 9)
+        start = time.perf_counter()
+        stats = pipeline.run()
+        elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "docs_per_sec": stats.documents / elapsed,
+        "chunks_per_sec": stats.chunks / elapsed,
+        "errors": stats.failed_documents + stats.failed_uploads
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare a run with a saved baseline.
+
+    Args:
+        results: "results" section of this run
+        baseline: "results" section of the baseline
+        tolerance: Allowed relative change, e.g. 0.2 for 20%
+
+    Returns:
+        Descriptions of the metrics that regressed beyond the tolerance
+    """
+    regressions = []
+    for scenario, levels in results.items():
+        for level, values in levels.items():
+            reference = baseline.get(scenario, {}).get(level, {})
+            for metric, value in values.items():
+                before = reference.get(metric)
+                if not before or metric in ("errors", "seconds"):
+                    continue
+                change = (value - before) / before
+                worse = -change if metric in THROUGHPUT_METRICS else change
+                marker = "REGRESSION" if worse > tolerance else ""
+                print(f"  {scenario:16} {level:>4} {metric:14} {before:10.2f} -> {value:10.2f} ({change:+.0%}) {marker}")
+                if marker:
+                    regressions.append(f"{scenario} {level} {metric}: {before:.2f} -> {value:.2f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against fake Azure services")
+    parser.add_argument("--docs", type=int, default=300, help="Synthetic documents to ingest")
+    parser.add_argument("--operations", type=int, default=200, help="Operations per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=str, default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--workers", type=int, default=2, help="Extraction processes for the ingestion scenario")
+    parser.add_argument("--search-latency", type=float, default=20.0, help="Injected search latency in ms")
+    parser.add_argument("--embedding-latency", type=float, default=30.0, help="Injected embedding latency in ms")
+    parser.add_argument("--chat-latency", type=float, default=300.0, help="Injected chat latency before the first token in ms")
+    parser.add_argument("--token-delay", type=float, default=5.0, help="Injected delay between chat tokens in ms")
+    parser.add_argument("--output", type=str, default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare with a JSON file from a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    # Measure the uncached paths, whatever the local .env enables
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+    os.environ["SEARCH_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["CHAT_HISTORY_SUMMARIZE"] = "false"
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory() as work_dir, FakeOpenAIServer(
+        embedding_delay=args.embedding_latency / 1000,
+        chat_delay=args.chat_latency / 1000,
+        chat_token_delay=args.token_delay / 1000
+    ) as openai_server:
+        os.environ["AZURE_OPENAI_ENDPOINT"] = openai_server.endpoint
+        source_dir = os.path.join(work_dir, "docs")
+        vocabulary = make_corpus(source_dir, args.docs)
+
+        print(f"Ingestion of {args.docs} documents:")
+        results["ingestion"] = {}
+        for level in levels:
+            results["ingestion"][f"c{level}"] = benchmark_ingestion(source_dir, work_dir, openai_server.endpoint, args, level)
+            print(f"  embedding concurrency {level}: {results['ingestion'][f'c{level}']}")
+
+        # Search and chat run against the index written by the first ingestion run
+        backend = LocalSearchBackend(os.path.join(work_dir, f"ingest_{levels[0]}"))
+        with FakeSearchServer(backend, latency=args.search_latency / 1000) as search_server:
+            embedder = Embedder(endpoint=openai_server.endpoint, api_key="fake-key", scheduler=RequestScheduler("benchmark"))
+            search_client = SearchClient(search_server.endpoint, INDEX_NAME, AzureKeyCredential("fake-key"))
+            retrieval_manager = RetrievalManager(embedder=embedder, search_client=search_client)
+            rng = random.Random(11)
+            queries = [" ".join(rng.choice(vocabulary) for _ in range(3)) for _ in range(args.operations)]
+
+            for search_type in SearchType:
+                scenario = f"search_{search_type.name.lower()}"
+                results[scenario] = {}
+                for level in levels:
+                    results[scenario][f"c{level}"] = measure(
+                        lambda i: retrieval_manager.search_documents(queries[i], top_k=5, search_type=search_type),
+                        args.operations, level
+                    )
+                    print(f"  {scenario} concurrency {level}: {results[scenario][f'c{level}']}")
+
+            chat_client = AzureOpenAI(api_key="fake-key", api_version="2024-10-21",
+                                      azure_endpoint=openai_server.endpoint, max_retries=0)
+            unlimited = RequestScheduler("benchmark-chat")
+
+            def chat_turn(i: int):
+                # A new session per operation, so every turn has the same prompt size
+                rag_chat = RAGChat(retrieval_manager, chat_client=chat_client, use_answer_cache=False)
+                rag_chat.scheduler = unlimited
+                rag_chat.chat(queries[i])
+
+            # Chat turns are slow; fewer of them keep the run short
+            chat_operations = max(levels[-1], args.operations // 4)
+            results["chat"] = {}
+            for level in levels:
+                results["chat"][f"c{level}"] = measure(chat_turn, chat_operations, level)
+                print(f"  chat concurrency {level}: {results['chat'][f'c{level}']}")
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparison with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
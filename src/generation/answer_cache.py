@@ -0,0 +1,148 @@
+from typing import Dict, Iterable, List, Optional
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utility.index_generation import IndexGeneration
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers looked up by question similarity.
+
+    Each entry holds a question's embedding, the chunk_ids retrieved for it and
+    the answer. A new question reuses an answer when its embedding is at least
+    `threshold` cosine-similar to a cached question and retrieval returned
+    exactly the same chunk_ids, so the model would have seen the same context.
+    Entries are evicted least recently used and can be invalidated by chunk_id.
+    When the index generation changes, i.e. a searched index is re-ingested,
+    only entries built from the chunks that ingestion recorded as changed are
+    dropped, or all of them if it recorded none.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000,
+                 generation: Optional[IndexGeneration] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.generation = generation
+        self._generation_value = generation.current() if generation else 0
+        # Unit-length question embeddings, one row per slot; allocated on the first store
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Optional[Dict]] = [None] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        # Occupied slots, least recently used first
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _check_generation(self):
+        if self.generation is None:
+            return
+        value = self.generation.current()
+        if value != self._generation_value:
+            changed = self.generation.changes_since(self._generation_value)
+            if changed is None:
+                self.invalidated += len(self._lru)
+                self._clear()
+            else:
+                self._invalidate(changed)
+            self._generation_value = value
+
+    def lookup(self, query_vector: List[float], chunk_ids: Iterable[str]) -> Optional[str]:
+        """
+        Find a cached answer for a question.
+
+        Args:
+            query_vector: Embedding of the question
+            chunk_ids: chunk_ids retrieved for the question, in rank order
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        chunk_ids = tuple(chunk_ids)
+        with self._lock:
+            self._check_generation()
+            best_slot = None
+            if self._lru:
+                slots = np.fromiter(self._lru, dtype=np.int64, count=len(self._lru))
+                vector = np.asarray(query_vector, dtype=np.float32)
+                vector /= np.linalg.norm(vector) or 1.0
+                similarities = self._vectors[slots] @ vector
+                # Best match first among those above the threshold
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.threshold:
+                        break
+                    if self._entries[slots[i]]["chunk_ids"] == chunk_ids:
+                        best_slot = int(slots[i])
+                        break
+            if best_slot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._lru.move_to_end(best_slot)
+            return self._entries[best_slot]["answer"]
+
+    def store(self, question: str, query_vector: List[float], chunk_ids: Iterable[str], answer: str):
+        with self._lock:
+            self._check_generation()
+            vector = np.asarray(query_vector, dtype=np.float32)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if not self._free:
+                slot, _ = self._lru.popitem(last=False)
+                self._free.append(slot)
+            slot = self._free.pop()
+            self._vectors[slot] = vector / (np.linalg.norm(vector) or 1.0)
+            self._entries[slot] = {"question": question, "chunk_ids": tuple(chunk_ids), "answer": answer}
+            self._lru[slot] = None
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """
+        Drop every answer that was generated from any of the given chunks.
+
+        Args:
+            chunk_ids: chunk_ids that were updated or deleted
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            return self._invalidate(chunk_ids)
+
+    def _invalidate(self, chunk_ids: Iterable[str]) -> int:
+        chunk_ids = set(chunk_ids)
+        stale = [slot for slot in self._lru if chunk_ids.intersection(self._entries[slot]["chunk_ids"])]
+        for slot in stale:
+            self._remove(slot)
+        self.invalidated += len(stale)
+        return len(stale)
+
+    def _remove(self, slot: int):
+        del self._lru[slot]
+        self._entries[slot] = None
+        self._free.append(slot)
+
+    def _clear(self):
+        for slot in list(self._lru):
+            self._remove(slot)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "invalidated": self.invalidated
+        }
@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from generation.answer_cache import SemanticAnswerCache
+from ingestion.ingestion_manifest import IngestionManifest
+from ingestion.local_ingestion import LocalIngestionPipeline, document_key
+from retrieval.local_search_backend import LocalSearchBackend
+from utility.fake_openai import fake_embedding
+from utility.index_generation import IndexGeneration
+
+DIMENSION = 64
+
+
+class FakeEmbedder:
+    def embed_texts(self, texts):
+        return [fake_embedding(text, DIMENSION) for text in texts]
+
+
+def write(source_dir: str, name: str, text: str):
+    with open(os.path.join(source_dir, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def ingest(source_dir: str, index: LocalSearchBackend, manifest_path: str, generation: IndexGeneration):
+    # What IngestionManager.run_local_ingestion does after a run
+    pipeline = LocalIngestionPipeline(source_dir, FakeEmbedder(), index, workers=1, report_every=10 ** 9,
+                                      manifest=IngestionManifest(manifest_path))
+    pipeline.run()
+    generation.bump(pipeline.changed_chunk_ids)
+    return pipeline
+
+
+def store(cache: SemanticAnswerCache, question: str, *chunk_ids: str):
+    cache.store(question, fake_embedding(question, DIMENSION), chunk_ids, f"Answer to {question}")
+
+
+def cached(cache: SemanticAnswerCache, question: str, *chunk_ids: str) -> bool:
+    return cache.lookup(fake_embedding(question, DIMENSION), chunk_ids) is not None
+
+
+def main():
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as index_dir:
+        generation = IndexGeneration("answers", index_dir)
+        index = LocalSearchBackend(index_dir, dimension=DIMENSION)
+        manifest_path = os.path.join(index_dir, "manifest.json")
+        for name in ("leave.txt", "travel.txt", "training.txt"):
+            write(source_dir, name, f"The {name[:-4]} policy applies to every employee.")
+        ingest(source_dir, index, manifest_path, generation)
+        leave, travel, training = (f"{document_key(name)}_pages_0" for name in ("leave.txt", "travel.txt", "training.txt"))
+
+        cache = SemanticAnswerCache(generation=generation)
+        store(cache, "How much leave do I get?", leave)
+        store(cache, "Are flights reimbursed?", travel)
+        store(cache, "Who pays for courses?", training, travel)
+        assert cache.invalidate_chunks([leave]) == 1 and not cached(cache, "How much leave do I get?", leave)
+        store(cache, "How much leave do I get?", leave)
+
+        # Editing one document and re-ingesting drops only the answers built from its chunks
+        write(source_dir, "travel.txt", "Travel must be booked through the portal.")
+        pipeline = ingest(source_dir, index, manifest_path, generation)
+        assert pipeline.changed_chunk_ids == {travel}, pipeline.changed_chunk_ids
+        assert cached(cache, "How much leave do I get?", leave)
+        assert not cached(cache, "Are flights reimbursed?", travel)
+        assert not cached(cache, "Who pays for courses?", training, travel)
+
+        # A re-run with nothing changed keeps everything; removing a document drops its answers
+        ingest(source_dir, index, manifest_path, generation)
+        assert cached(cache, "How much leave do I get?", leave)
+        os.remove(os.path.join(source_dir, "leave.txt"))
+        ingest(source_dir, index, manifest_path, generation)
+        assert not cached(cache, "How much leave do I get?", leave)
+
+        # A bump that does not know what changed, e.g. an indexer run, drops every answer
+        store(cache, "Who pays for courses?", training)
+        generation.bump()
+        assert not cached(cache, "Who pays for courses?", training)
+        print(f"Answer cache across re-ingestion: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
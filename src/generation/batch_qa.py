@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Set
+sys.path.append(str(Path(__file__).parent.parent))
+
+from generation.rag_chat import RAGChat
+from utility import component_registry
+from utility.request_scheduler import Priority
+
+
+class PrecomputedQueryEmbedder:
+    """
+    Embedder that serves query vectors computed up front.
+
+    Queries outside vectors are embedded by the wrapped embedder; every other
+    attribute is the wrapped embedder's.
+    """
+
+    def __init__(self, embedder, vectors: Dict[str, List[float]]):
+        self.embedder = embedder
+        self.vectors = vectors
+
+    def embed_query(self, query: str) -> List[float]:
+        vector = self.vectors.get(query)
+        return vector if vector is not None else self.embedder.embed_query(query)
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+
+def read_questions(path: str) -> List[Dict]:
+    """
+    Read questions from a JSON lines file.
+
+    Each line is an object with a "question" and an optional "id"; lines
+    without an id are identified by their line number.
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            questions.append({"id": str(record.get("id", line_number)), "question": record["question"]})
+    return questions
+
+
+def completed_ids(path: str) -> Set[str]:
+    # Ids answered by a previous run; failed questions are retried
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short when the previous run was interrupted
+                continue
+            if "error" not in record:
+                done.add(str(record["id"]))
+    return done
+
+
+class BatchQA:
+    """
+    Answers a batch of independent questions with the full RAGChat pipeline.
+
+    Identical questions are answered once, all query embeddings are computed
+    in one batched embed_texts call, and up to concurrency questions are in
+    flight at once at BULK priority, so interactive traffic on the same
+    deployments is served first. Each result is appended to the output file
+    as soon as it is ready, which makes an interrupted run resumable.
+    """
+
+    def __init__(self, retrieval_manager=None, chat_client=None, concurrency: int = 8, use_answer_cache: bool = True):
+        self.retrieval_manager = retrieval_manager or component_registry.get_retrieval_manager()
+        self.chat_client = chat_client
+        self.concurrency = concurrency
+        self.use_answer_cache = use_answer_cache
+        self._lock = threading.Lock()
+
+    def run(self, questions: List[Dict], output_path: str) -> Dict[str, int]:
+        """
+        Answer questions whose ids are not already in output_path and append the results.
+
+        Returns:
+            Counts of questions answered, skipped as already done, deduplicated and failed
+        """
+        done = completed_ids(output_path)
+        pending = [question for question in questions if question["id"] not in done]
+        # Identical questions share one pipeline run
+        groups: Dict[str, List[Dict]] = {}
+        for question in pending:
+            groups.setdefault(question["question"].strip(), []).append(question)
+        stats = {"answered": 0, "skipped": len(questions) - len(pending),
+                 "deduplicated": len(pending) - len(groups), "failed": 0}
+        if not groups:
+            return stats
+
+        # One batched embedding pass instead of a request per question. The vectors are served by
+        # a manager of this batch's own, since the shared one is also used by other callers
+        retrieval_manager = self.retrieval_manager
+        embedder = retrieval_manager.embedder
+        if embedder is not None:
+            texts = list(groups)
+            vectors = embedder.embed_texts(texts, priority=Priority.BULK)
+            retrieval_manager = retrieval_manager.with_embedder(
+                PrecomputedQueryEmbedder(embedder, dict(zip(texts, vectors)))
+            )
+
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self._answer, retrieval_manager, text): text for text in groups}
+            for future in as_completed(futures):
+                result = future.result()
+                for question in groups[futures[future]]:
+                    record = {"id": question["id"], "question": question["question"], **result}
+                    with self._lock:
+                        output.write(json.dumps(record) + "\n")
+                        output.flush()
+                    stats["failed" if "error" in result else "answered"] += 1
+        return stats
+
+    def _answer(self, retrieval_manager, question: str) -> Dict:
+        start = time.perf_counter()
+        try:
+            # A fresh session per question: answers must not depend on the other questions
+            rag_chat = RAGChat(retrieval_manager, chat_client=self.chat_client,
+                               use_answer_cache=self.use_answer_cache)
+            rag_chat.priority = Priority.BULK
+            answer = rag_chat.chat(question)
+        except Exception as e:
+            return {"error": f"{e.__class__.__name__}: {e}", "seconds": time.perf_counter() - start}
+        return {
+            "answer": answer,
+            "chunk_ids": rag_chat.last_chunk_ids,
+            "cached": rag_chat.last_answer_cached,
+            "answerable": rag_chat.last_answerable,
+            "timings": rag_chat.last_timings,
+            "seconds": time.perf_counter() - start
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch Q&A - Answer a JSON lines file of questions with the RAG pipeline")
+    parser.add_argument("input", type=str, help='JSON lines file with {"id": ..., "question": ...} per line')
+    parser.add_argument("output", type=str, help="JSON lines file the answers are appended to; answered ids are skipped on rerun")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions answered at once (default: 8)")
+    parser.add_argument(
+        "--no-answer-cache",
+        action="store_true",
+        default=False,
+        help="Always call the model instead of reusing cached answers to near-duplicate questions"
+    )
+    args = parser.parse_args()
+
+    questions = read_questions(args.input)
+    start = time.perf_counter()
+    stats = BatchQA(concurrency=args.concurrency, use_answer_cache=not args.no_answer_cache).run(questions, args.output)
+    elapsed = time.perf_counter() - start
+    print(f"Batch complete in {elapsed:.1f}s: {stats['answered']} answered, {stats['failed']} failed, "
+          f"{stats['skipped']} already done, {stats['deduplicated']} duplicates of other questions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from generation.retrieval_policy import AdaptiveRetrievalPolicy, raw_score
+from retrieval.retrieval_manager import SearchType
+from utility import component_registry
+
+
+def collect_scores(retrieval_manager, questions: List[Dict], search_type: SearchType, top_k: int) -> List[Dict]:
+    # The service scores of each labelled question's results, in rank order, as the policy sees them
+    collected = []
+    for i, question in enumerate(questions, start=1):
+        results = retrieval_manager.search_documents(question["question"], top_k=top_k, search_type=search_type)
+        collected.append({"answerable": question["answerable"], "scores": [raw_score(result) for result in results]})
+        if i % 50 == 0:
+            print(f"Searched {i}/{len(questions)} questions")
+    return collected
+
+
+def calibrate(collected: List[Dict], initial_k: int, max_false_rejection: float, widen_rate: float) -> Dict[str, float]:
+    """
+    Pick min_score and margin from the scores of labelled questions.
+
+    Args:
+        collected: {"answerable", "scores"} per question
+        initial_k: Results retrieved when the cut-off is clear
+        max_false_rejection: Share of answerable questions that may be answered without the model
+        widen_rate: Share of answerable questions whose retrieval should be widened
+
+    Returns:
+        min_score, margin and how they split the labelled questions
+    """
+    best = lambda item: max(item["scores"], default=0.0)
+    answerable = np.array([best(item) for item in collected if item["answerable"]])
+    off_topic = np.array([best(item) for item in collected if not item["answerable"]])
+    if len(answerable) == 0:
+        raise ValueError("Calibration needs at least one answerable question")
+
+    # Highest threshold that rejects at most max_false_rejection of the answerable questions
+    min_score = float(np.quantile(answerable, max_false_rejection, method="lower"))
+    gaps = [
+        (item["scores"][initial_k - 1] - item["scores"][initial_k]) / item["scores"][0]
+        for item in collected
+        if item["answerable"] and len(item["scores"]) > initial_k and item["scores"][0] > 0
+    ]
+    margin = float(np.quantile(gaps, widen_rate)) if gaps else 0.0
+    return {
+        "min_score": min_score,
+        "margin": margin,
+        "answerable_questions": int(len(answerable)),
+        "off_topic_questions": int(len(off_topic)),
+        "false_rejection_rate": float((answerable < min_score).mean()),
+        "off_topic_rejection_rate": float((off_topic < min_score).mean()) if len(off_topic) else None,
+        "answerable_best_score_p50": float(np.median(answerable)),
+        "off_topic_best_score_p50": float(np.median(off_topic)) if len(off_topic) else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the adaptive retrieval policy from labelled questions")
+    parser.add_argument("questions", type=str,
+                        help='JSON lines file with {"question": ..., "answerable": true|false} per line')
+    parser.add_argument("--output", type=str, default="retrieval_policy.json", help="Policy file to write")
+    parser.add_argument("--search-type", type=str, default="HYBRID", choices=[t.name for t in SearchType])
+    parser.add_argument("--initial-k", type=int, default=3, help="Results retrieved when the cut-off is clear")
+    parser.add_argument("--max-k", type=int, default=8, help="Results retrieved when the cut-off is ambiguous")
+    parser.add_argument("--max-false-rejection", type=float, default=0.02,
+                        help="Share of answerable questions that may get the no-information answer (default: 0.02)")
+    parser.add_argument("--widen-rate", type=float, default=0.25,
+                        help="Share of answerable questions whose retrieval is widened to --max-k (default: 0.25)")
+    args = parser.parse_args()
+
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+    search_type = SearchType[args.search_type]
+    collected = collect_scores(component_registry.get_retrieval_manager(), questions, search_type, args.initial_k + 1)
+    calibration = calibrate(collected, args.initial_k, args.max_false_rejection, args.widen_rate)
+
+    policy = AdaptiveRetrievalPolicy(search_type=search_type, initial_k=args.initial_k, max_k=args.max_k,
+                                     margin=calibration["margin"],
+                                     min_score=calibration["min_score"])
+    policy.save(args.output, calibration)
+    print(json.dumps(calibration, indent=2))
+    rejection = calibration["off_topic_rejection_rate"]
+    if rejection is not None and rejection < 0.5:
+        # Hybrid scores from Reciprocal Rank Fusion depend on ranks only, not on how well anything matched
+        print(f"Warning: only {rejection:.0%} of off-topic questions fall below min_score; "
+              f"{search_type.name} scores barely separate them here, try --search-type VECTOR or TEXT")
+    print(f"Policy written to {args.output}; set RETRIEVAL_POLICY_PATH to use it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from typing import Any, Callable, Dict, List, Optional
+import time
+import threading
+
+from utility.tokens import count_tokens
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an assistant that answers "
+    "questions from documents. Update the summary with the new messages. Keep facts, names, numbers "
+    "and anything the user may refer back to. Reply with the updated summary only, in at most {words} words."
+)
+REWRITE_INSTRUCTIONS = (
+    "Rewrite the user's follow-up question as a standalone search query, resolving references to the "
+    "conversation so far. Reply with the query only."
+)
+
+
+class ChatMemory:
+    """
+    Token-bounded view of a conversation for the prompt.
+
+    The most recent turns are kept verbatim within token_budget; older messages
+    are folded into a running summary by the chat model, a few messages at a
+    time, so the history in the prompt stays roughly constant in size however
+    long the session runs. Without a complete function, older messages are dropped.
+
+    The message list itself is left untouched (RAGChat exposes it as
+    chat_history); only what is rendered into the prompt is bounded.
+    """
+
+    def __init__(self, messages: Optional[List[Dict[str, str]]] = None,
+                 complete: Optional[Callable[..., Any]] = None,
+                 token_budget: int = 1500, recent_turns: int = 3, summary_words: int = 150):
+        """
+        Args:
+            messages: The conversation, appended to by the caller
+            complete: Called as complete(messages, **parameters) to get a chat completion, e.g.
+                RAGChat._create_completion, which waits for quota in the shared scheduler and retries
+            token_budget: Maximum tokens of history in the prompt
+            recent_turns: Turns kept verbatim
+            summary_words: Length limit of the running summary
+        """
+        self.messages = messages if messages is not None else []
+        self.complete = complete
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_words = summary_words
+        self.summary = ""
+        # messages[:_summarized] are folded into the summary (or dropped)
+        self._summarized = 0
+        self._thread: Optional[threading.Thread] = None
+        self.last_compact_seconds = 0.0
+
+    def _sync(self):
+        # The message list may have been cleared or replaced by the caller
+        if len(self.messages) < self._summarized:
+            self.summary = ""
+            self._summarized = 0
+
+    def _window_start(self) -> int:
+        # Oldest message kept verbatim: at most recent_turns turns, within the budget left by the summary
+        budget = self.token_budget - (count_tokens(self.summary) if self.summary else 0)
+        start = len(self.messages)
+        lowest = max(self._summarized, len(self.messages) - 2 * self.recent_turns)
+        while start > lowest:
+            message = self.messages[start - 1]
+            tokens = count_tokens(f"{message['role']}: {message['content']}")
+            if tokens > budget:
+                break
+            budget -= tokens
+            start -= 1
+        return start
+
+    def render(self) -> str:
+        """
+        Text of the conversation so far for the prompt: the summary, then recent messages.
+
+        Returns:
+            History text, empty for a new conversation
+        """
+        self.wait()
+        self._sync()
+        start = self._window_start()
+        lines = [f"Summary of the earlier conversation: {self.summary}"] if self.summary else []
+        lines.extend(f"{message['role']}: {message['content']}" for message in self.messages[start:])
+        return "\n".join(lines)
+
+    def compact(self):
+        """Fold messages that no longer fit in the verbatim window into the summary."""
+        self._sync()
+        end = self._window_start()
+        if end <= self._summarized:
+            return
+        if self.complete is None:
+            self._summarized = end
+            return
+        start = time.perf_counter()
+        new_messages = "\n".join(f"{message['role']}: {message['content']}" for message in self.messages[self._summarized:end])
+        try:
+            completion = self.complete(
+                [
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(words=self.summary_words)},
+                    {"role": "user", "content": f"Current summary:\n{self.summary or '(none)'}\n\nNew messages:\n{new_messages}"}
+                ],
+                max_tokens=2 * self.summary_words,
+                temperature=0.0
+            )
+            self.summary = (completion.choices[0].message.content or "").strip()
+            self._summarized = end
+        except Exception as e:
+            # Retried on the next turn; until then the prompt simply carries less history
+            print(f"Failed to summarize chat history: {e}")
+        self.last_compact_seconds = time.perf_counter() - start
+
+    def compact_in_background(self):
+        """Summarize in a background thread, so it overlaps with the user reading the answer."""
+        self.wait()
+        self._thread = threading.Thread(target=self.compact, daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def rewrite_query(self, question: str) -> str:
+        """
+        Turn a follow-up question into a standalone search query.
+
+        Args:
+            question: The user's latest question, not yet in the message list
+
+        Returns:
+            The rewritten query, or the question itself for a new conversation or on failure
+        """
+        history = self.render()
+        if not history or self.complete is None:
+            return question
+        try:
+            completion = self.complete(
+                [
+                    {"role": "system", "content": REWRITE_INSTRUCTIONS},
+                    {"role": "user", "content": f"Conversation:\n{history}\n\nFollow-up question: {question}"}
+                ],
+                max_tokens=100,
+                temperature=0.0
+            )
+            return (completion.choices[0].message.content or "").strip() or question
+        except Exception as e:
+            print(f"Failed to rewrite the question, searching with it as asked: {e}")
+            return question
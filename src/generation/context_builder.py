@@ -0,0 +1,100 @@
+from typing import Dict, List, Optional
+import re
+
+from utility.tokens import count_tokens, truncate_to_tokens
+
+PAGE_NUMBER = re.compile(r"_pages_(\d+)$")
+# Longest overlap looked for between consecutive chunks; the skillset overlaps pages by 500 characters
+MAX_OVERLAP = 1000
+# Shorter matches are coincidences, e.g. a shared trailing period
+MIN_OVERLAP = 20
+# A truncated section shorter than this is dropped rather than sent as a fragment
+MIN_SECTION_TOKENS = 50
+
+
+def _page_number(doc: Dict) -> Optional[int]:
+    match = PAGE_NUMBER.search(str(doc.get("chunk_id", "")))
+    return int(match.group(1)) if match else None
+
+
+def _overlap(left: str, right: str) -> int:
+    # Length of the longest suffix of left that is also a prefix of right
+    for length in range(min(len(left), len(right), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def merge_chunks(docs: List[Dict]) -> List[Dict]:
+    """
+    Merge retrieved chunks of the same document into sections.
+
+    Chunks sharing a parent_id are put in page order. Consecutive pages that
+    overlap are joined with the overlap kept only once; other chunks of the
+    same document are joined with a gap marker. Sections are ordered by the
+    best rank among their chunks, and carry only the title and the text.
+
+    Args:
+        docs: Search results, best first
+
+    Returns:
+        List of {"title", "content"} dicts
+    """
+    groups: Dict[str, List] = {}
+    for rank, doc in enumerate(docs):
+        key = doc.get("parent_id") or f"chunk:{doc.get('chunk_id', rank)}"
+        groups.setdefault(key, []).append((rank, doc))
+
+    sections = []
+    for group in groups.values():
+        group.sort(key=lambda item: (_page_number(item[1]) is None, _page_number(item[1]) or 0, item[0]))
+        content = ""
+        previous_page = None
+        for _, doc in group:
+            text = (doc.get("chunk") or "").strip()
+            page = _page_number(doc)
+            adjacent = previous_page is not None and page == previous_page + 1
+            overlap = _overlap(content, text) if content and adjacent else 0
+            if not content:
+                content = text
+            elif overlap:
+                content += text[overlap:]
+            elif text not in content:
+                content += "\n...\n" + text
+            previous_page = page
+        sections.append((min(rank for rank, _ in group), {"title": group[0][1].get("title", ""), "content": content}))
+    sections.sort(key=lambda item: item[0])
+    return [section for _, section in sections]
+
+
+def build_context(docs: List[Dict], token_budget: int = 3000) -> str:
+    """
+    Assemble retrieved chunks into the context text sent to the model.
+
+    Overlapping chunks are merged (see merge_chunks) and sections are added
+    best first until the token budget is spent; the last section that doesn't
+    fit is cut at a word boundary.
+
+    Args:
+        docs: Search results, best first
+        token_budget: Maximum tokens of context
+
+    Returns:
+        Context text with one titled section per source document
+    """
+    parts = []
+    remaining = token_budget
+    for number, section in enumerate(merge_chunks(docs), start=1):
+        header = f"[{number}] {section['title']}\n"
+        available = remaining - count_tokens(header) - 2
+        if available < MIN_SECTION_TOKENS:
+            break
+        content = truncate_to_tokens(section["content"], available)
+        if content is None:
+            break
+        part = header + content
+        parts.append(part)
+        remaining -= count_tokens(part) + 2
+        if content != section["content"]:
+            break
+    return "\n\n".join(parts)
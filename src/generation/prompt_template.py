@@ -0,0 +1,87 @@
+from typing import TYPE_CHECKING, Any, Dict, List
+import os
+import re
+import time
+import threading
+
+from jinja2 import Environment
+
+if TYPE_CHECKING:
+    import prompty
+
+
+class PromptTemplate:
+    """
+    A prompty file parsed once and rendered from the cached, compiled template.
+
+    prompty.prepare builds a new Jinja environment and recompiles the template on
+    every call. Here the file is loaded and compiled once and only reloaded when
+    its modification time changes, so edits still take effect without a restart.
+    """
+
+    # Same role markers as prompty's chat parser
+    ROLES = ["assistant", "function", "system", "user"]
+    ROLE_SEPARATOR = re.compile(r"(?i)^\s*#?\s*(" + "|".join(ROLES) + r")\s*:\s*\n", flags=re.MULTILINE)
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self.load_count = 0
+        self.last_load_seconds = 0.0
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._prompt = None
+        self._template = None
+        self._refresh()
+
+    @property
+    def prompt(self) -> "prompty.Prompty":
+        """The loaded prompty, with model configuration and parameters."""
+        self._refresh()
+        return self._prompt
+
+    def _refresh(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            start = time.perf_counter()
+            # prompty pulls in its tracing and invoker modules, only worth loading once a prompt is needed
+            import prompty
+            prompt = prompty.load(self.path)
+            template = Environment().from_string(prompt.content)
+            self._prompt, self._template, self._mtime = prompt, template, mtime
+            self.load_count += 1
+            self.last_load_seconds = time.perf_counter() - start
+
+    def render(self, inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Render the template into chat messages.
+
+        Args:
+            inputs: Template inputs; missing ones fall back to the prompty's sample values
+
+        Returns:
+            List of {"role", "content"} messages
+        """
+        self._refresh()
+        prompt, template = self._prompt, self._template
+        data = {**prompt.sample, **inputs}
+        return self._parse(template.render(**data))
+
+    def _parse(self, text: str) -> List[Dict[str, Any]]:
+        chunks = [item for item in self.ROLE_SEPARATOR.split(text) if item.strip()]
+        # No leading role marker means the text is a system message
+        if chunks[0].strip().lower() not in self.ROLES:
+            chunks.insert(0, "system")
+        # A trailing role marker has no content
+        if chunks[-1].strip().lower() in self.ROLES:
+            chunks.pop()
+        if len(chunks) % 2 != 0:
+            raise ValueError(f"Invalid prompt format in {self.path}")
+
+        return [
+            {"role": chunks[i].strip().lower(), "content": chunks[i + 1].strip()}
+            for i in range(0, len(chunks), 2)
+        ]
@@ -1,33 +1,274 @@
-from retrieval.retrieval_manager import RetrievalManager, SearchType
-import prompty
-import prompty.azure
+from typing import TYPE_CHECKING, Dict, Iterator, List
+from generation.prompt_template import PromptTemplate
+from generation.context_builder import build_context
+from generation.chat_memory import ChatMemory
+from generation.retrieval_policy import AdaptiveRetrievalPolicy
+from utility import component_registry
+from utility.request_scheduler import Priority, RETRYABLE_STATUS_CODES, retry_after_seconds
+from utility.tokens import count_tokens
+from utility import metrics
+import random
 import os
-from dotenv import load_dotenv
+import time
 import pathlib
 
-# Load environment variables from the src directory
-env_path = pathlib.Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path,override=True)
+if TYPE_CHECKING:
+    from retrieval.retrieval_manager import RetrievalManager
+
+# Metric names of the stages in RAGChat.last_timings
+STAGE_METRICS = {
+    "history": "rag_history_seconds",
+    "retrieval": "rag_retrieval_stage_seconds",
+    "render": "rag_render_seconds",
+    "answer_cache": "rag_answer_cache_seconds",
+    "first_token": "rag_llm_first_token_seconds",
+    "completion": "rag_llm_total_seconds",
+}
+
+PROMPT_PATH = os.path.join(pathlib.Path(__file__).parent.resolve(), "rag_chat.prompty")
 
 class RAGChat:
 
-    def __init__(self, retrieval_manager: RetrievalManager):
+    def __init__(self, retrieval_manager: "RetrievalManager", prompt_template: PromptTemplate = None, chat_client=None,
+                 use_answer_cache: bool = True, context_token_budget: int = None, rewrite_queries: bool = None,
+                 retrieval_policy: AdaptiveRetrievalPolicy = None):
+        # Settings come from src/.env unless already set in the environment
+        component_registry.load_env()
         self.retrieval_manager = retrieval_manager
         self.chat_history = []
+        # The parsed prompt template and the pooled chat client are shared process-wide unless provided
+        self.prompt_template = prompt_template or component_registry.get_rag_prompt()
+        self.chat_client = chat_client or component_registry.get_chat_client()
+        # Only a bounded view of chat_history goes into the prompt: recent turns plus a running summary
+        # Summaries and query rewrites go through _create_completion, so they share the quota and retries
+        self.memory = ChatMemory(
+            self.chat_history,
+            complete=self._create_completion if os.getenv("CHAT_HISTORY_SUMMARIZE", "true").lower() == "true" else None,
+            token_budget=int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500")),
+            recent_turns=int(os.getenv("CHAT_HISTORY_RECENT_TURNS", "3"))
+        )
+        # Completions wait for quota in the process-wide chat scheduler
+        self.scheduler = component_registry.get_scheduler("chat")
+        self.priority = Priority.INTERACTIVE
+        self.max_retries = 5
+        # Rewrite follow-up questions into standalone search queries (one extra model call per follow-up)
+        if rewrite_queries is None:
+            rewrite_queries = os.getenv("CHAT_REWRITE_QUERIES", "false").lower() == "true"
+        self.rewrite_queries = rewrite_queries
+        # Answers to near-duplicate first questions are shared across sessions. The cache needs the
+        # query embedding, so it is only used with a retrieval manager that has an embedder
+        self.answer_cache = None
+        if use_answer_cache and getattr(retrieval_manager, "embedder", None) is not None:
+            self.answer_cache = component_registry.get_answer_cache(getattr(retrieval_manager, "generation_names", None))
+        # How many chunks to retrieve, and when to answer without the model (see retrieval_policy)
+        self.retrieval_policy = retrieval_policy or component_registry.get_retrieval_policy()
+        # Maximum tokens of retrieved document text in the prompt
+        self.context_token_budget = context_token_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+        # Seconds spent in each stage of the most recent turn
+        self.last_timings: Dict[str, float] = {}
+        # chunk_ids retrieved for the most recent turn, in rank order
+        self.last_chunk_ids: List[str] = []
+        self.last_answer_cached = False
+        # False when the most recent turn was answered without the model because nothing relevant was found
+        self.last_answerable = True
+        self._query_vector = None
 
     def chat(self, user_query: str) -> str:
+        turn_start = time.perf_counter()
+        messages = self._prepare_messages(user_query)
+        answer = self._answer_without_model(user_query)
+        if answer is not None:
+            self.chat_history.append({"role": "assistant", "content": answer})
+            self._record_metrics(turn_start)
+            return answer
+        start = time.perf_counter()
+        # Call the shared client directly: prompty.execute would build a new AzureOpenAI client per call
+        completion = self._create_completion(messages)
+        result = completion.choices[0].message.content
+        self.last_timings["completion"] = time.perf_counter() - start
+        self.chat_history.append({"role": "assistant", "content": result})
+        self._store_answer(user_query, result)
+        self.memory.compact_in_background()
+        self._record_metrics(turn_start)
+        return result
+
+    def chat_stream(self, user_query: str) -> Iterator[str]:
+        """
+        Generate a response token by token.
+
+        The full response is recorded in chat history once the stream finishes,
+        or whatever was produced so far if the consumer stops early. Nothing is
+        recorded if the stream fails or produced no text.
+
+        Args:
+            user_query: The user's question
+
+        Returns:
+            Iterator over response text fragments as the model produces them
+        """
+        turn_start = time.perf_counter()
+        messages = self._prepare_messages(user_query)
+        answer = self._answer_without_model(user_query)
+        if answer is not None:
+            self.chat_history.append({"role": "assistant", "content": answer})
+            self._record_metrics(turn_start)
+            yield answer
+            return
+        start = time.perf_counter()
+        stream, reserved_tokens = self._send_completion(messages, stream=True)
+        parts = []
+        usage = None
+        failed = False
+        try:
+            for chunk in stream:
+                # The last chunk carries the usage of the whole response (stream_options include_usage)
+                if chunk.usage is not None:
+                    usage = chunk.usage.total_tokens
+                # Azure sends chunks without choices, e.g. prompt filter results and the usage chunk
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if not parts:
+                        self.last_timings["first_token"] = time.perf_counter() - start
+                    parts.append(delta)
+                    yield delta
+        except Exception:
+            # A consumer stopping early raises GeneratorExit, which is not a failure
+            failed = True
+            raise
+        finally:
+            stream.close()
+            if usage is None:
+                # Stopped before the usage chunk: charge the prompt and the tokens produced so far
+                usage = sum(count_tokens(message["content"]) for message in messages) + count_tokens("".join(parts))
+            self.scheduler.release(reserved_tokens, usage)
+            self.last_timings["completion"] = time.perf_counter() - start
+            # A failed or empty answer would show up as the assistant's reply in later prompts
+            if parts and not failed:
+                self.chat_history.append({"role": "assistant", "content": "".join(parts)})
+                self.memory.compact_in_background()
+            self._record_metrics(turn_start)
+        # Only complete answers are worth reusing
+        if parts:
+            self._store_answer(user_query, "".join(parts))
+
+    def _record_metrics(self, turn_start: float):
+        if not metrics.enabled():
+            return
+        answer = "no_information" if not self.last_answerable else "cached" if self.last_answer_cached else "model"
+        for stage, seconds in self.last_timings.items():
+            metrics.observe(STAGE_METRICS.get(stage, f"rag_{stage}_seconds"), seconds)
+        metrics.observe("rag_turn_seconds", time.perf_counter() - turn_start, answer=answer)
+
+    def _create_completion(self, messages: List[Dict[str, str]], **parameters):
+        """
+        Send a chat completion through the scheduler, retrying throttled and transient failures.
+
+        Args:
+            messages: Rendered prompt messages
+            parameters: Model parameters overriding the prompty's, e.g. max_tokens
+
+        Returns:
+            The completion
+        """
+        completion, tokens = self._send_completion(messages, **parameters)
+        if completion.usage is not None:
+            self.scheduler.release(tokens, completion.usage.total_tokens)
+        return completion
+
+    def _send_completion(self, messages: List[Dict[str, str]], stream: bool = False, **parameters):
+        """
+        Send a chat completion, retrying throttled and transient failures.
+
+        Returns:
+            The completion or stream, and the tokens reserved for it in the scheduler;
+            the caller releases them once the usage is known
+        """
+        from openai import APIConnectionError, APIStatusError
+        model = self.prompt_template.prompt.model
+        parameters = {**model.parameters, **parameters}
+        if stream:
+            parameters["stream_options"] = {"include_usage": True}
+        # Prompt tokens plus the completion limit; corrected from the reported usage when there is one
+        tokens = sum(count_tokens(message["content"]) for message in messages) + parameters.get("max_tokens", 0)
+        attempt = 0
+        while True:
+            self.scheduler.acquire(tokens, self.priority)
+            try:
+                completion = self.chat_client.chat.completions.create(
+                    model=model.configuration["azure_deployment"],
+                    messages=messages,
+                    stream=stream,
+                    **parameters
+                )
+                return completion, tokens
+            except (APIConnectionError, APIStatusError) as e:
+                retryable = isinstance(e, APIConnectionError) or e.status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = min(0.5 * 2 ** attempt, 30.0) * (0.5 + random.random() / 2)
+                print(f"Chat completion failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+                if isinstance(e, APIStatusError) and e.status_code == 429:
+                    # Every chat request in the process waits out the throttle
+                    self.scheduler.penalize(delay)
+                else:
+                    time.sleep(delay)
+                attempt += 1
+
+    def _answer_cache_applies(self) -> bool:
+        # Later turns depend on the conversation so far, only a session's first question is shared
+        return self.answer_cache is not None and len(self.chat_history) == 1
+
+    def _answer_without_model(self, user_query: str):
+        # Questions the documents don't cover, and near-duplicates of answered ones, skip the model
+        if not self.last_answerable:
+            self.last_answer_cached = False
+            self._query_vector = None
+            return self.retrieval_policy.no_answer_message
+        return self._cached_answer(user_query)
+
+    def _cached_answer(self, user_query: str):
+        self.last_answer_cached = False
+        self._query_vector = None
+        if not self._answer_cache_applies():
+            return None
+        start = time.perf_counter()
+        # Hybrid retrieval has just embedded the query, so this is an embedding cache hit
+        self._query_vector = self.retrieval_manager.embedder.embed_query(user_query)
+        answer = self.answer_cache.lookup(self._query_vector, self.last_chunk_ids)
+        self.last_timings["answer_cache"] = time.perf_counter() - start
+        self.last_answer_cached = answer is not None
+        return answer
+
+    def _store_answer(self, user_query: str, answer: str):
+        if answer and self._query_vector is not None:
+            self.answer_cache.store(user_query, self._query_vector, self.last_chunk_ids, answer)
+
+    def _prepare_messages(self, user_query: str) -> List[Dict[str, str]]:
         
         print(f"User Query: {user_query}")
+        self.last_timings = {}
+        # History before this question, bounded to the memory's token budget
+        start = time.perf_counter()
+        history = self.memory.render()
+        search_query = self.memory.rewrite_query(user_query) if self.rewrite_queries else user_query
+        self.last_timings["history"] = time.perf_counter() - start
         self.chat_history.append({"role": "user", "content": user_query})
-        # Step 1: Retrieve relevant documents based on the user query
-        retrieved_docs = self.retrieval_manager.search_documents(user_query, top_k=3, search_type=SearchType.HYBRID)
-
-        # Step 2: Generate a response using the retrieved documents
-        data_path = os.path.join(pathlib.Path(__file__).parent.resolve(), "rag_chat.prompty")
-        prompty_obj = prompty.load(data_path)
-        #TO DO: Add chat history support
-        prepared_template = prompty.prepare(prompty_obj, inputs= {"question":user_query, "context":retrieved_docs, "chat_history":self.chat_history})
-        full_context = prepared_template[0]["content"]
-        result = prompty.execute(data_path, inputs= {"question":user_query, "context":retrieved_docs, "chat_history":self.chat_history})
-        self.chat_history.append({"role": "assistant", "content": result})
-        return result
\ No newline at end of file
+        # Step 1: Retrieve relevant documents based on the user query, as many as the policy asks for
+        start = time.perf_counter()
+        retrieved_docs, self.last_answerable = self.retrieval_policy.retrieve(self.retrieval_manager, search_query)
+        self.last_timings["retrieval"] = time.perf_counter() - start
+        self.last_chunk_ids = [doc["chunk_id"] for doc in retrieved_docs]
+        if not self.last_answerable:
+            # The answer won't come from the model, so there is no prompt to render
+            return []
+
+        # Step 2: Merge overlapping chunks and pack them into the token budget, then render the cached prompt template
+        start = time.perf_counter()
+        context = build_context(retrieved_docs, self.context_token_budget)
+        messages = self.prompt_template.render({"question":user_query, "context":context, "chat_history":history})
+        self.last_timings["render"] = time.perf_counter() - start
+        return messages
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import argparse
 from pathlib import Path
 
@@ -7,6 +8,32 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from generation.rag_chat import RAGChat
 from retrieval.retrieval_manager import RetrievalManager
+from utility.fake_openai import FakeOpenAIServer
+
+
+class FixedRetrievalManager:
+    # Returns the same documents for every query, so --fake needs no search service
+    def search_documents(self, query, top_k=5, search_type=None):
+        return [{
+            "title": "policy.pdf",
+            "chunk": "Employees can claim reimbursement for approved training courses.",
+            "chunk_id": "fake_chunk_0",
+            "parent_id": "fake_parent",
+            "score": 1.0
+        }][:top_k]
+
+
+def run_stream(rag_chat: RAGChat, query: str):
+    start = time.perf_counter()
+    first_token = None
+    print("Response:")
+    for token in rag_chat.chat_stream(query):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        print(token, end="", flush=True)
+    total = time.perf_counter() - start
+    print(f"\n\nTime to first token: {first_token or total:.3f}s, total: {total:.3f}s")
+    print(f"Stage timings: {rag_chat.last_timings}")
 
 
 def main():
@@ -18,18 +45,45 @@ def main():
         nargs="?",
         help="The query to ask the RAG system"
     )
-    
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=False,
+        help="Stream the response token by token"
+    )
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        default=False,
+        help="Use a local fake chat endpoint and fixed documents instead of Azure services"
+    )
+
     args = parser.parse_args()
-    
+
     # If no command-line argument, prompt for input
     if args.query:
         query = args.query
     else:
         query = input("Enter your query: ")
-    
+
     print(f"\nQuery: {query}\n")
-    response = RAGChat(retrieval_manager=RetrievalManager()).chat(query)
-    print(f"Response:\n{response}")
+    if args.fake:
+        from openai import AzureOpenAI
+        with FakeOpenAIServer(chat_token_delay=0.02) as server:
+            os.environ["AZURE_OPENAI_ENDPOINT"] = server.endpoint
+            chat_client = AzureOpenAI(api_key="fake-key", api_version="2024-10-21", azure_endpoint=server.endpoint)
+            rag_chat = RAGChat(retrieval_manager=FixedRetrievalManager(), chat_client=chat_client)
+            run_stream(rag_chat, query)
+            assert rag_chat.chat_history[-1]["content"] == server.chat_response, "Streamed answer not recorded in history"
+        return
+
+    rag_chat = RAGChat(retrieval_manager=RetrievalManager())
+    if args.stream:
+        run_stream(rag_chat, query)
+    else:
+        response = rag_chat.chat(query)
+        print(f"Response:\n{response}")
+        print(f"Stage timings: {rag_chat.last_timings}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
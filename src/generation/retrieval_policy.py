@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional, Tuple
+import os
+import json
+
+from retrieval.retrieval_manager import SearchType
+
+NO_INFORMATION_ANSWER = (
+    "I couldn't find anything about that in the indexed documents, so I don't have enough information to answer. "
+    "Try rephrasing the question or asking about a topic the documents cover."
+)
+
+
+def raw_score(result: Dict) -> float:
+    # Results merged from several indexes carry normalized scores; the gate needs the service's own
+    return result.get("raw_score", result["score"])
+
+
+class AdaptiveRetrievalPolicy:
+    """
+    Decides how many chunks to retrieve for a question, and whether it is worth a model call.
+
+    The first search asks for initial_k results plus one. When the drop in
+    score from the initial_k-th result to the next one is less than margin
+    (relative to the best score), the cut-off is ambiguous: relevant chunks
+    likely continue past it, so the search is repeated with max_k. When the
+    best score is below min_score, nothing relevant was found and the caller
+    can answer with no_answer_message instead of calling the model.
+
+    Scores are the service's @search.score: the "raw_score" of results merged
+    from several indexes, otherwise their "score". min_score and margin only
+    mean something for the search type they were calibrated on (see
+    calibrate_retrieval_policy.py).
+    The defaults reproduce a plain top-3 hybrid search.
+    """
+
+    def __init__(self, search_type: SearchType = SearchType.HYBRID, initial_k: int = 3, max_k: int = 8,
+                 margin: float = 0.0, min_score: Optional[float] = None,
+                 no_answer_message: str = NO_INFORMATION_ANSWER):
+        """
+        Args:
+            search_type: Search type used for every retrieval
+            initial_k: Results retrieved when the cut-off is clear
+            max_k: Results retrieved when the cut-off is ambiguous
+            margin: Relative score drop below which the cut-off counts as ambiguous; 0 never widens
+            min_score: Best score below which a question is treated as unanswerable; None always answers
+            no_answer_message: Answer given without calling the model
+        """
+        self.search_type = search_type
+        self.initial_k = initial_k
+        self.max_k = max(max_k, initial_k)
+        self.margin = margin
+        self.min_score = min_score
+        self.no_answer_message = no_answer_message
+        self.retrievals = 0
+        self.widened = 0
+        self.unanswerable = 0
+
+    def retrieve(self, retrieval_manager, query: str) -> Tuple[List[Dict], bool]:
+        """
+        Retrieve chunks for a query.
+
+        Args:
+            retrieval_manager: Manager whose search_documents is called
+            query: Search query
+
+        Returns:
+            The retrieved chunks, best first, and whether the question looks answerable from them
+        """
+        self.retrievals += 1
+        probe_k = self.initial_k + 1 if self.margin > 0 and self.max_k > self.initial_k else self.initial_k
+        results = retrieval_manager.search_documents(query, top_k=probe_k, search_type=self.search_type)
+        scores = [raw_score(result) for result in results]
+        if self.min_score is not None and (not scores or max(scores) < self.min_score):
+            self.unanswerable += 1
+            return results[:self.initial_k], False
+        if probe_k > self.initial_k and self.is_ambiguous(scores):
+            self.widened += 1
+            # With the embedding cache on, the query vector is not computed again
+            return retrieval_manager.search_documents(query, top_k=self.max_k, search_type=self.search_type), True
+        return results[:self.initial_k], True
+
+    def is_ambiguous(self, scores: List[float]) -> bool:
+        # Compares the last result kept with the first one left out
+        if len(scores) <= self.initial_k or scores[0] <= 0:
+            return False
+        return (scores[self.initial_k - 1] - scores[self.initial_k]) / scores[0] < self.margin
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "retrievals": self.retrievals,
+            "widened": self.widened,
+            "unanswerable": self.unanswerable,
+            "unanswerable_rate": self.unanswerable / self.retrievals if self.retrievals else 0.0
+        }
+
+    def to_config(self) -> Dict:
+        return {
+            "search_type": self.search_type.name,
+            "initial_k": self.initial_k,
+            "max_k": self.max_k,
+            "margin": self.margin,
+            "min_score": self.min_score,
+            "no_answer_message": self.no_answer_message
+        }
+
+    def save(self, path: str, calibration: Optional[Dict] = None):
+        """Write the policy to a JSON file, with optional calibration details for reference."""
+        config = self.to_config()
+        if calibration:
+            config["calibration"] = calibration
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "AdaptiveRetrievalPolicy":
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(
+            search_type=SearchType[config.get("search_type", "HYBRID")],
+            initial_k=config.get("initial_k", 3),
+            max_k=config.get("max_k", 8),
+            margin=config.get("margin", 0.0),
+            min_score=config.get("min_score"),
+            no_answer_message=config.get("no_answer_message", NO_INFORMATION_ANSWER)
+        )
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from generation.calibrate_retrieval_policy import calibrate, collect_scores
+from generation.retrieval_policy import AdaptiveRetrievalPolicy
+from retrieval.fusion import merge_index_results
+from retrieval.retrieval_manager import SearchType
+
+
+class MultiIndexRetrieval:
+    """Serves fixed per-index results merged the way RetrievalManager fans out across indexes."""
+
+    def __init__(self, results_by_query):
+        self.results_by_query = results_by_query
+
+    def search_documents(self, query, top_k=5, search_type=SearchType.HYBRID):
+        return merge_index_results(self.results_by_query[query], top_k, normalize=search_type != SearchType.VECTOR)
+
+
+def hits(index: str, *scores: float):
+    return [{"chunk_id": f"{index}{rank}", "score": score} for rank, score in enumerate(scores)]
+
+
+def main():
+    retrieval = MultiIndexRetrieval({
+        # Weak matches in both indexes: merged and normalized, the best one still scores 1.0
+        "off topic": {"hr": hits("hr", 0.4, 0.3, 0.2), "it": hits("it", 0.5, 0.1)},
+        "leave policy": {"hr": hits("hr", 9.0, 8.5, 8.0, 7.9), "it": hits("it", 1.0)},
+    })
+    assert retrieval.search_documents("off topic", 3)[0]["score"] == 1.0
+
+    policy = AdaptiveRetrievalPolicy(search_type=SearchType.TEXT, initial_k=3, max_k=5, margin=0.05, min_score=2.0)
+    docs, answerable = policy.retrieve(retrieval, "off topic")
+    assert not answerable, "Expected the gate to use the raw scores of merged results"
+    docs, answerable = policy.retrieve(retrieval, "leave policy")
+    assert answerable and len(docs) == 5, "Expected an answerable question with an ambiguous cut-off to be widened"
+    print(f"Policy on multi-index results: {policy.stats()}")
+
+    questions = [{"question": "leave policy", "answerable": True}, {"question": "off topic", "answerable": False}]
+    calibration = calibrate(collect_scores(retrieval, questions, SearchType.TEXT, 4), 3, 0.0, 0.5)
+    assert calibration["min_score"] == 9.0 and calibration["off_topic_rejection_rate"] == 1.0, calibration
+    print(f"Calibration on multi-index results: {calibration}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from contextlib import contextmanager
+from pathlib import Path
+
+
+sys.path.append(str(Path(__file__).parent.parent))
+# Every turn repeats the same query; the result cache would hide the per-turn cost being measured
+os.environ["SEARCH_CACHE_MAX_ENTRIES"] = "0"
+from generation.rag_chat import RAGChat
+from retrieval.retrieval_manager import RetrievalManager
+from utility import component_registry
+
+FAKE_INDEX = "turn-latency-index"
+FAKE_CHUNKS = [
+    "Employees can claim reimbursement for approved training courses.",
+    "Travel expenses are reimbursed within 30 days of submitting receipts.",
+    "Annual leave requests need manager approval two weeks in advance.",
+]
+
+
+@contextmanager
+def fake_services(connect_delay: float, latency: float):
+    """Fake Azure OpenAI and Azure AI Search endpoints, with the environment pointing at them."""
+    from benchmark.fake_search import FakeSearchServer
+    from retrieval.local_search_backend import LocalSearchBackend
+    from utility.fake_openai import FakeOpenAIServer, fake_embedding
+
+    with tempfile.TemporaryDirectory() as index_dir, \
+            FakeOpenAIServer(connect_delay=connect_delay, chat_delay=latency, embedding_delay=latency) as openai_server:
+        backend = LocalSearchBackend(index_dir)
+        backend.upload_documents([
+            {"chunk_id": f"chunk_{i}", "parent_id": f"doc_{i}", "title": f"policy_{i}.pdf", "chunk": chunk,
+             "text_vector": fake_embedding(chunk, openai_server.dimension)}
+            for i, chunk in enumerate(FAKE_CHUNKS)
+        ])
+        backend.save()
+        with FakeSearchServer(backend, latency=latency, connect_delay=connect_delay) as search_server:
+            os.environ.update({
+                "AZURE_OPENAI_ENDPOINT": openai_server.endpoint,
+                "AZURE_OPENAI_API_KEY": "fake-key",
+                "OPENAI_API_VERSION": "2024-10-21",
+                "AZURE_OPENAI_ENDPOINT_FOR_EMBEDDING": openai_server.endpoint,
+                "AZURE_OPENAI_KEY_FOR_EMBEDDING": "fake-key",
+                "AZURE_SEARCH_SERVICE_ENDPOINT": search_server.endpoint,
+                "AZURE_SEARCH_INDEX": FAKE_INDEX,
+                "AZURE_SEARCH_ADMIN_KEY": "fake-key",
+                "AZURE_SEARCH_INDEXES": "",
+                "SEARCH_BACKEND": "azure",
+                "EMBEDDING_CACHE_PATH": "",
+                "CHAT_HISTORY_SUMMARIZE": "false",
+            })
+            yield
+
+
+def rebuilt_turn(query: str) -> str:
+    # Previous app.py behaviour: new manager, search client and OpenAI clients every turn
+    component_registry.reset()
+    return RAGChat(retrieval_manager=RetrievalManager(), use_answer_cache=False).chat(query)
+
+
+def shared_turn(rag_chat: RAGChat, query: str) -> str:
+    # Keep the prompt the same size as a fresh RAGChat's
+    rag_chat.chat_history.clear()
+    return rag_chat.chat(query)
+
+
+def measure(label: str, turn, turns: int):
+    latencies = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        turn()
+        latencies.append(time.perf_counter() - start)
+    print(f"{label}: p50={statistics.median(latencies) * 1000:.0f}ms "
+          f"min={min(latencies) * 1000:.0f}ms max={max(latencies) * 1000:.0f}ms over {turns} turns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-turn latency with and without shared components")
+    parser.add_argument("query", type=str, nargs="?", default="What is the reimbursement policy?")
+    parser.add_argument("--turns", type=int, default=5, help="Turns to measure per mode")
+    parser.add_argument("--fake", action="store_true", default=False,
+                        help="Use local fake Azure OpenAI and Azure AI Search endpoints instead of Azure services")
+    parser.add_argument("--connect-latency", type=float, default=60.0,
+                        help="With --fake, ms to set up each new connection, standing in for TCP and TLS setup")
+    parser.add_argument("--latency", type=float, default=20.0,
+                        help="With --fake, ms of each search, embedding and chat request")
+    args = parser.parse_args()
+
+    if args.fake:
+        with fake_services(args.connect_latency / 1000, args.latency / 1000):
+            compare(args)
+    else:
+        compare(args)
+
+
+def compare(args):
+    measure("Rebuilt per turn", lambda: rebuilt_turn(args.query), args.turns)
+
+    component_registry.reset()
+    rag_chat = RAGChat(retrieval_manager=component_registry.get_retrieval_manager(), use_answer_cache=False)
+    # Warm up the pooled connections once, as a long-running app process would have
+    rag_chat.chat(args.query)
+    measure("Shared components", lambda: shared_turn(rag_chat, args.query), args.turns)
+
+if __name__ == "__main__":
+    main()
@@ -15,11 +15,37 @@ def main():
         default=False,
         help="Create a new indexer (default: False)"
     )
+    parser.add_argument(
+        "--source-dir",
+        type=str,
+        default=None,
+        help="Chunk and embed documents from this directory locally instead of using the indexer skillset"
+    )
+    parser.add_argument(
+        "--local-index",
+        action="store_true",
+        default=False,
+        help="With --source-dir, write to the local index instead of Azure AI Search"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="With --source-dir, number of extraction processes (default: CPU count)"
+    )
+    parser.add_argument(
+        "--full-reingest",
+        action="store_true",
+        default=False,
+        help="With --source-dir, re-extract and re-embed every document instead of only changed ones"
+    )
     
     args = parser.parse_args()
     
     print(f"Creating indexer: {args.create_indexer}")
-    IngestionManager(create_indexer=args.create_indexer)
+    IngestionManager(create_indexer=args.create_indexer, source_dir=args.source_dir,
+                     local_index=args.local_index, workers=args.workers,
+                     full_reingest=args.full_reingest)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,20 @@
-from ingestion.search_service_manager import SearchServiceManager
+import os
+from pathlib import Path
 
 
 class IngestionManager:
     # Implementation of ingestion manager
-    def __init__(self, create_indexer: bool = True):
+    def __init__(self, create_indexer: bool = True, source_dir: str = None, local_index: bool = False,
+                 workers: int = None, full_reingest: bool = False):
         # initiate the search service manager
         self.create_indexer = create_indexer
+        if source_dir is not None:
+            print(f"Ingesting documents from {source_dir} with the local pipeline.")
+            self.stats = self.run_local_ingestion(source_dir, local_index, workers, full_reingest)
+            return
+
+        # The Azure AI Search SDK is only loaded when the service is used
+        from ingestion.search_service_manager import SearchServiceManager
         self.search_service_manager = SearchServiceManager()
         if self.create_indexer:
             print("Setting up the ingestion pipeline with indexer.")
@@ -14,3 +23,39 @@ class IngestionManager:
             print("Indexer creation skipped as per the argument.")
             print("Run the indexer")
             self.search_service_manager.run_indexer()
+
+    def run_local_ingestion(self, source_dir: str, local_index: bool = False, workers: int = None,
+                            full_reingest: bool = False):
+        # Chunk and embed locally, then push documents to the Azure index or the local index
+        from ingestion.ingestion_manifest import IngestionManifest
+        from ingestion.local_ingestion import LocalIngestionPipeline
+        from utility.embedder import Embedder
+        from utility.index_generation import IndexGeneration
+
+        if local_index:
+            from retrieval.local_search_backend import LocalSearchBackend, vector_index_options
+            index_path = os.getenv("LOCAL_INDEX_PATH", str(Path(__file__).parent.parent / '.cache' / 'local_index'))
+            print(f"Writing to the local index at {index_path}")
+            search_client = LocalSearchBackend(index_path, **vector_index_options())
+            manifest_path = os.path.join(index_path, "manifest.json")
+            generation_name = os.path.basename(os.path.normpath(index_path))
+        else:
+            from ingestion.search_service_manager import SearchServiceManager
+            self.search_service_manager = SearchServiceManager()
+            if self.create_indexer:
+                # Only the index is needed, chunking and embedding replace the skillset
+                self.search_service_manager.create_search_index()
+            search_client = self.search_service_manager.get_search_client()
+            manifest_path = str(Path(__file__).parent.parent / '.cache' /
+                                f"{self.search_service_manager.search_index}.manifest.json")
+            generation_name = self.search_service_manager.search_index
+
+        # The manifest records what previous runs indexed, so unchanged documents are skipped
+        manifest_path = os.getenv("INGESTION_MANIFEST_PATH", manifest_path)
+        print(f"Using the ingestion manifest at {manifest_path}")
+        pipeline = LocalIngestionPipeline(source_dir, Embedder(), search_client, workers=workers,
+                                          manifest=IngestionManifest(manifest_path), full_reingest=full_reingest)
+        stats = pipeline.run()
+        # Invalidate search results cached by running apps, and the answers built from changed chunks
+        IndexGeneration(generation_name).bump(pipeline.changed_chunk_ids)
+        return stats
@@ -0,0 +1,44 @@
+from typing import Dict, List, Optional
+import os
+import json
+
+
+class IngestionManifest:
+    """
+    Persistent record of what the local ingestion pipeline has indexed.
+
+    Maps each source document's relative path to its content hash, its chunk_ids
+    and the hash of each chunk's text, so a re-run can skip unchanged documents,
+    reuse vectors of unchanged chunks and delete chunks of removed documents.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.documents: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.documents = json.load(f).get("documents", {})
+
+    def get(self, relative_path: str) -> Optional[Dict]:
+        return self.documents.get(relative_path)
+
+    def update(self, relative_path: str, content_hash: str, chunk_ids: List[str], chunk_hashes: List[str]):
+        self.documents[relative_path] = {
+            "hash": content_hash,
+            "chunk_ids": chunk_ids,
+            "chunk_hashes": chunk_hashes
+        }
+
+    def remove(self, relative_path: str) -> Optional[Dict]:
+        return self.documents.pop(relative_path, None)
+
+    def paths(self) -> List[str]:
+        return list(self.documents)
+
+    def save(self):
+        # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents}, f)
+        os.replace(temp_path, self.path)
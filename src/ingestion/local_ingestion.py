@@ -0,0 +1,439 @@
+from typing import Dict, Iterator, List, Optional
+import os
+import time
+import base64
+import hashlib
+from html.parser import HTMLParser
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from ingestion.ingestion_manifest import IngestionManifest
+
+# Same chunking parameters as the SplitSkill in SearchServiceManager.create_skillset
+MAX_PAGE_LENGTH = 2000
+PAGE_OVERLAP_LENGTH = 500
+
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".json"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+
+
+class _HTMLTextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def extract_text(path: str, data: bytes) -> str:
+    """
+    Extract plain text from a document's bytes.
+
+    PDF extraction needs the optional pypdf package.
+
+    Args:
+        path: File path, used to pick the extractor by extension
+        data: File contents
+
+    Returns:
+        Extracted text
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in HTML_EXTENSIONS:
+        parser = _HTMLTextExtractor()
+        parser.feed(data.decode("utf-8", errors="replace"))
+        return " ".join(" ".join(parser.parts).split())
+    if extension in PDF_EXTENSIONS:
+        try:
+            from io import BytesIO
+            from pypdf import PdfReader
+        except ImportError:
+            raise RuntimeError(f"pypdf is required to ingest PDF files such as {path}")
+        reader = PdfReader(BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    return data.decode("utf-8", errors="replace")
+
+
+def chunk_text(text: str, max_length: int = MAX_PAGE_LENGTH, overlap: int = PAGE_OVERLAP_LENGTH) -> List[str]:
+    """
+    Split text into overlapping pages, like the SplitSkill's "pages" mode.
+
+    Pages end at a sentence or line break when one falls in the second half of
+    the page, otherwise at a word boundary.
+
+    Args:
+        text: Text to split
+        max_length: Maximum characters per page
+        overlap: Characters repeated from the end of the previous page
+
+    Returns:
+        List of page texts
+    """
+    text = text.strip()
+    if len(text) <= max_length:
+        return [text] if text else []
+
+    pages = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_length, len(text))
+        if end < len(text):
+            window = text[start + max_length // 2:end]
+            cut = max(window.rfind(". "), window.rfind("\n"), window.rfind("? "), window.rfind("! "))
+            if cut >= 0:
+                end = start + max_length // 2 + cut + 1
+            else:
+                space = text.rfind(" ", start + 1, end)
+                end = space if space > start else end
+        page = text[start:end].strip()
+        if page:
+            pages.append(page)
+        if end >= len(text):
+            break
+        # Start the next page about `overlap` characters back, on a word boundary
+        next_start = max(end - overlap, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space >= 0 else next_start
+    return pages
+
+
+def document_key(relative_path: str) -> str:
+    # URL-safe base64 of the path, like the indexer's metadata_storage_path key
+    return base64.urlsafe_b64encode(relative_path.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def process_document(path: str, root: str, max_length: int = MAX_PAGE_LENGTH,
+                     overlap: int = PAGE_OVERLAP_LENGTH, known_hash: Optional[str] = None) -> Dict:
+    """
+    Read, extract and chunk one document. Runs in a worker process.
+
+    Args:
+        path: Absolute file path
+        root: Source directory, for the document's relative path
+        max_length: Maximum characters per chunk
+        overlap: Characters of overlap between chunks
+        known_hash: Content hash from a previous run; if it matches, extraction is skipped
+
+    Returns:
+        Dict with relative path, title, parent_id, content hash, chunks, chunk hashes and worker seconds
+    """
+    start = time.perf_counter()
+    relative_path = os.path.relpath(path, root).replace(os.sep, "/")
+    with open(path, "rb") as f:
+        data = f.read()
+    content_hash = hashlib.sha256(data).hexdigest()
+    result = {
+        "path": relative_path,
+        "title": os.path.basename(path),
+        "parent_id": document_key(relative_path),
+        "hash": content_hash,
+        "unchanged": content_hash == known_hash,
+        "chunks": [],
+        "chunk_hashes": []
+    }
+    if not result["unchanged"]:
+        result["chunks"] = chunk_text(extract_text(path, data), max_length, overlap)
+        result["chunk_hashes"] = [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in result["chunks"]]
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def iter_documents(source_dir: str) -> Iterator[str]:
+    for directory, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+class IngestionStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.documents = 0
+        self.chunks = 0
+        self.unchanged_documents = 0
+        self.removed_documents = 0
+        self.reused_vectors = 0
+        self.deleted_chunks = 0
+        self.failed_documents = 0
+        self.failed_uploads = 0
+        self.extract_seconds = 0.0  # Summed across worker processes
+        self.embed_seconds = 0.0
+        self.upload_seconds = 0.0
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (
+            f"{self.documents} docs, {self.chunks} chunks in {elapsed:.1f}s "
+            f"({self.documents / elapsed:.1f} docs/sec, {self.chunks / elapsed:.1f} chunks/sec); "
+            f"extract+chunk {self.extract_seconds:.1f}s (worker total), embed {self.embed_seconds:.1f}s, "
+            f"upload {self.upload_seconds:.1f}s, failed docs {self.failed_documents}, failed uploads {self.failed_uploads}; "
+            f"unchanged docs {self.unchanged_documents}, removed docs {self.removed_documents}, "
+            f"reused vectors {self.reused_vectors}, deleted chunks {self.deleted_chunks}"
+        )
+
+
+class LocalIngestionPipeline:
+    """
+    Streaming ingestion that chunks and embeds locally instead of in the skillset.
+
+    Documents are extracted and chunked in a process pool, chunk texts are
+    embedded in batches through Embedder.embed_texts, and the resulting index
+    documents are pushed to the search client in bounded batches. At most
+    max_pending_docs documents are in flight at once, so memory stays flat
+    however large the corpus is.
+
+    With a manifest, unchanged documents are skipped without extraction,
+    unchanged chunks of modified documents reuse their indexed vectors, and
+    chunks of modified or removed documents that no longer exist are deleted.
+    A document's manifest entry is only updated once all its chunks are
+    uploaded, and the manifest is saved every manifest_save_interval seconds
+    and at the end, so an interrupted run is picked up by the next one.
+    Reused vectors are read back with one filtered search per batch of chunks.
+    """
+
+    def __init__(self, source_dir: str, embedder, search_client, workers: Optional[int] = None,
+                 embed_batch_size: int = 64, upload_batch_size: int = 500,
+                 max_pending_docs: Optional[int] = None, report_every: int = 100,
+                 manifest: Optional[IngestionManifest] = None, full_reingest: bool = False,
+                 manifest_save_interval: float = 30.0):
+        """
+        Args:
+            source_dir: Directory to walk for documents
+            embedder: Embedder used for chunk vectors
+            search_client: Azure SearchClient or local backend receiving the documents
+            workers: Extraction processes, defaults to the CPU count
+            embed_batch_size: Chunks per embed_texts call
+            upload_batch_size: Documents per upload call
+            max_pending_docs: Documents being extracted at once, defaults to 4 per worker
+            report_every: Print progress every this many documents
+            manifest: Record of the previous run, enables incremental re-ingestion
+            full_reingest: Re-extract and re-embed every document; the manifest is still
+                used to delete chunks that no longer exist
+            manifest_save_interval: Seconds between manifest saves during the run
+        """
+        self.source_dir = os.path.abspath(source_dir)
+        self.embedder = embedder
+        self.search_client = search_client
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self.upload_batch_size = upload_batch_size
+        self.max_pending_docs = max_pending_docs or self.workers * 4
+        self.report_every = report_every
+        self.manifest = manifest
+        self.full_reingest = full_reingest
+        self.manifest_save_interval = manifest_save_interval
+        self.stats = IngestionStats()
+        # Buffered chunks are (source path, index document) pairs
+        self._embed_buffer: List[tuple] = []
+        # Chunks whose vector may be read back from the index: (source path, index document, indexed chunk_id)
+        self._reuse_buffer: List[tuple] = []
+        self._upload_buffer: List[tuple] = []
+        self._delete_buffer: List[str] = []
+        # Documents whose chunks are not all uploaded yet: path -> manifest entry and remaining count
+        self._in_flight: Dict[str, Dict] = {}
+        self._seen = set()
+        self._manifest_saved = time.monotonic()
+        # chunk_ids whose text changed or that were deleted in the last run, for invalidating caches
+        self.changed_chunk_ids = set()
+
+    def run(self) -> IngestionStats:
+        self.stats = IngestionStats()
+        self._seen = set()
+        self._manifest_saved = time.monotonic()
+        self.changed_chunk_ids = set()
+        paths = iter_documents(self.source_dir)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                # Keep the pool busy without reading ahead more than max_pending_docs
+                while not exhausted and len(pending) < self.max_pending_docs:
+                    path = next(paths, None)
+                    if path is None:
+                        exhausted = True
+                    else:
+                        pending.add(self._submit(pool, path))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        self._handle_document(future.result())
+                    except Exception as e:
+                        self.stats.failed_documents += 1
+                        print(f"Failed to process document: {e}")
+
+        self._flush_reused()
+        self._flush_embeddings()
+        self._flush_uploads()
+        if self.manifest is not None:
+            self._remove_missing_documents()
+            self._flush_uploads()
+            self.manifest.save()
+        if hasattr(self.search_client, "save"):
+            self.search_client.save()
+        print(f"Local ingestion complete: {self.stats.report()}")
+        return self.stats
+
+    def _submit(self, pool: ProcessPoolExecutor, path: str):
+        relative_path = os.path.relpath(path, self.source_dir).replace(os.sep, "/")
+        # Recorded at submit time so a document that fails to process is not treated as removed
+        self._seen.add(relative_path)
+        known_hash = None
+        if self.manifest is not None and not self.full_reingest:
+            entry = self.manifest.get(relative_path)
+            known_hash = entry["hash"] if entry else None
+        return pool.submit(process_document, path, self.source_dir, known_hash=known_hash)
+
+    def _handle_document(self, document: Dict):
+        self.stats.documents += 1
+        self.stats.extract_seconds += document["seconds"]
+        path = document["path"]
+        if document["unchanged"]:
+            self.stats.unchanged_documents += 1
+            return
+
+        previous = self.manifest.get(path) if self.manifest is not None else None
+        # Vectors of chunks whose text is unchanged can be read back from the index
+        reusable = {}
+        if previous and not self.full_reingest:
+            reusable = dict(zip(previous["chunk_hashes"], previous["chunk_ids"]))
+        chunk_ids = [f"{document['parent_id']}_pages_{i}" for i in range(len(document["chunks"]))]
+        self._in_flight[path] = {
+            "hash": document["hash"],
+            "chunk_ids": chunk_ids,
+            "chunk_hashes": document["chunk_hashes"],
+            "remaining": len(chunk_ids),
+            "failed": False
+        }
+        for chunk_id, chunk, chunk_hash in zip(chunk_ids, document["chunks"], document["chunk_hashes"]):
+            doc = {
+                "chunk_id": chunk_id,
+                "parent_id": document["parent_id"],
+                "title": document["title"],
+                "chunk": chunk
+            }
+            if chunk_hash in reusable:
+                self._reuse_buffer.append((path, doc, reusable[chunk_hash]))
+            else:
+                self._embed_buffer.append((path, doc))
+        previous_hashes = dict(zip(previous["chunk_ids"], previous["chunk_hashes"])) if previous else {}
+        self.changed_chunk_ids.update(
+            chunk_id for chunk_id, chunk_hash in zip(chunk_ids, document["chunk_hashes"])
+            if previous_hashes.get(chunk_id) != chunk_hash
+        )
+        if previous:
+            current = set(chunk_ids)
+            deleted = [chunk_id for chunk_id in previous["chunk_ids"] if chunk_id not in current]
+            self._delete_buffer.extend(deleted)
+            self.changed_chunk_ids.update(deleted)
+        if not chunk_ids:
+            self._complete(path)
+
+        # Vectors are looked up in batches of the embedding batch size
+        if len(self._reuse_buffer) >= self.embed_batch_size:
+            self._flush_reused()
+        if len(self._upload_buffer) >= self.upload_batch_size:
+            self._flush_uploads()
+        if len(self._embed_buffer) >= self.embed_batch_size:
+            self._flush_embeddings()
+        if self.stats.documents % self.report_every == 0:
+            print(f"Progress: {self.stats.report()}")
+
+    def _indexed_vectors(self, chunk_ids: List[str]) -> Dict[str, List[float]]:
+        # chunk_ids are URL-safe base64 plus a page suffix, so they never contain the comma delimiter or quotes
+        try:
+            results = self.search_client.search(
+                search_text="*",
+                filter=f"search.in(chunk_id, '{','.join(chunk_ids)}', ',')",
+                select=["chunk_id", "text_vector"],
+                top=len(chunk_ids)
+            )
+            return {result["chunk_id"]: result["text_vector"] for result in results if result.get("text_vector")}
+        except Exception as e:
+            # Not retrievable: embed the chunks again
+            print(f"Failed to read back indexed vectors, embedding {len(chunk_ids)} chunks again: {e}")
+            return {}
+
+    def _flush_reused(self):
+        if not self._reuse_buffer:
+            return
+        vectors = self._indexed_vectors([chunk_id for _, _, chunk_id in self._reuse_buffer])
+        for path, doc, chunk_id in self._reuse_buffer:
+            vector = vectors.get(chunk_id)
+            if vector is not None:
+                self.stats.reused_vectors += 1
+                self.stats.chunks += 1
+                self._upload_buffer.append((path, {**doc, "text_vector": vector}))
+            else:
+                # Missing from the index: embed the chunk again
+                self._embed_buffer.append((path, doc))
+        self._reuse_buffer = []
+
+    def _complete(self, path: str):
+        entry = self._in_flight.pop(path)
+        if self.manifest is not None and not entry["failed"]:
+            self.manifest.update(path, entry["hash"], entry["chunk_ids"], entry["chunk_hashes"])
+
+    def _remove_missing_documents(self):
+        # Documents recorded by an earlier run that no longer exist in the source directory
+        for path in self.manifest.paths():
+            if path not in self._seen:
+                entry = self.manifest.remove(path)
+                self._delete_buffer.extend(entry["chunk_ids"])
+                self.changed_chunk_ids.update(entry["chunk_ids"])
+                self.stats.removed_documents += 1
+
+    def _flush_embeddings(self):
+        if not self._embed_buffer:
+            return
+        start = time.perf_counter()
+        vectors = self.embedder.embed_texts([doc["chunk"] for _, doc in self._embed_buffer])
+        self.stats.embed_seconds += time.perf_counter() - start
+        for (path, doc), vector in zip(self._embed_buffer, vectors):
+            self._upload_buffer.append((path, {**doc, "text_vector": vector}))
+        self.stats.chunks += len(self._embed_buffer)
+        self._embed_buffer = []
+        if len(self._upload_buffer) >= self.upload_batch_size:
+            self._flush_uploads()
+
+    def _flush_uploads(self):
+        # Chunks keep positional chunk_ids, so a shifted chunk's old vector may sit under a chunk_id that
+        # this flush overwrites or deletes: read back every pending reused vector first
+        self._flush_reused()
+        if not self._upload_buffer and not self._delete_buffer:
+            return
+        start = time.perf_counter()
+        if self._upload_buffer:
+            results = self.search_client.upload_documents(documents=[doc for _, doc in self._upload_buffer])
+            for (path, _), result in zip(self._upload_buffer, results):
+                # Azure returns IndexingResult objects, the local backend returns dicts
+                succeeded = result.get("succeeded") if isinstance(result, dict) else result.succeeded
+                entry = self._in_flight[path]
+                if not succeeded:
+                    self.stats.failed_uploads += 1
+                    entry["failed"] = True
+                entry["remaining"] -= 1
+                if entry["remaining"] == 0:
+                    self._complete(path)
+        if self._delete_buffer:
+            self.search_client.delete_documents(documents=[{"chunk_id": chunk_id} for chunk_id in self._delete_buffer])
+            self.stats.deleted_chunks += len(self._delete_buffer)
+        self.stats.upload_seconds += time.perf_counter() - start
+        self._upload_buffer = []
+        self._delete_buffer = []
+        if self.manifest is not None and time.monotonic() - self._manifest_saved >= self.manifest_save_interval:
+            self.manifest.save()
+            self._manifest_saved = time.monotonic()
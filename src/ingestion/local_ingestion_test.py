@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from ingestion.ingestion_manifest import IngestionManifest
+from ingestion.local_ingestion import LocalIngestionPipeline, chunk_text, document_key
+from retrieval.local_search_backend import LocalSearchBackend
+from utility.fake_openai import fake_embedding
+
+DIMENSION = 64
+
+
+class FakeEmbedder:
+    """Deterministic embeddings, so every indexed vector can be checked against its chunk text."""
+
+    def embed_texts(self, texts):
+        return [fake_embedding(text, DIMENSION) for text in texts]
+
+
+def lines(*tags: str) -> str:
+    # Lines of 1000 characters with the same word layout, so pages always end on a line break and a
+    # line inserted at the top moves every later page down one position with its text unchanged
+    def line(tag):
+        return " ".join(f"{tag}w{j:03d}" for j in range(200))[:999].rstrip().ljust(999, "x") + "\n"
+    return "".join(line(tag) for tag in tags)
+
+
+def write(source_dir: str, name: str, text: str):
+    with open(os.path.join(source_dir, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def ingest(source_dir: str, index: LocalSearchBackend, manifest_path: str):
+    # One worker keeps the documents in order; one chunk per upload flushes uploads while
+    # reusable chunks of an earlier document are still waiting for their vectors
+    pipeline = LocalIngestionPipeline(source_dir, FakeEmbedder(), index, workers=1, embed_batch_size=8,
+                                      upload_batch_size=1, report_every=10 ** 9,
+                                      manifest=IngestionManifest(manifest_path))
+    return pipeline.run()
+
+
+def check_vectors(index: LocalSearchBackend, documents: dict):
+    wrong = []
+    for name, text in documents.items():
+        for i in range(len(chunk_text(text))):
+            chunk_id = f"{document_key(name)}_pages_{i}"
+            doc = index.get_document(chunk_id, ["chunk", "text_vector"])
+            if float(np.dot(doc["text_vector"], fake_embedding(doc["chunk"], DIMENSION))) < 0.999:
+                wrong.append(chunk_id)
+    assert not wrong, f"Indexed vectors do not match their chunk text: {wrong}"
+
+
+def main():
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as index_dir:
+        index = LocalSearchBackend(index_dir, dimension=DIMENSION)
+        manifest_path = os.path.join(index_dir, "manifest.json")
+        write(source_dir, "a.txt", lines("aa", "bb", "cc", "dd", "ee", "ff"))
+        first = ingest(source_dir, index, manifest_path)
+
+        # A line inserted at the top: the old pages come back one position later, under new chunk_ids,
+        # and the new pages take over chunk_ids whose old vectors are still to be reused
+        documents = {
+            "a.txt": lines("zz", "aa", "bb", "cc", "dd", "ee", "ff"),
+            "b.txt": lines("mm", "nn", "oo", "pp", "qq", "rr", "ss", "tt")
+        }
+        for name, text in documents.items():
+            write(source_dir, name, text)
+        second = ingest(source_dir, index, manifest_path)
+
+        assert second.reused_vectors == first.chunks - 1, second.report()
+        assert index.get_document_count() == sum(len(chunk_text(text)) for text in documents.values())
+        check_vectors(index, documents)
+        print(f"Re-ingestion with shifted chunks: {second.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,22 @@
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents.indexes import SearchIndexClient, SearchIndexerClient
-from azure.search.documents.indexes.models import (
-    SearchField,
-    SearchFieldDataType,
-    VectorSearch,
-    HnswAlgorithmConfiguration,
-    VectorSearchProfile,
-    AzureOpenAIVectorizer,
-    AzureOpenAIVectorizerParameters,
-    SearchIndex,
-    SearchIndexerDataContainer,
-    SearchIndexerDataSourceConnection,
-    SplitSkill,
-    InputFieldMappingEntry,
-    OutputFieldMappingEntry,
-    AzureOpenAIEmbeddingSkill,
-    EntityRecognitionSkill,
-    SearchIndexerIndexProjection,
-    SearchIndexerIndexProjectionSelector,
-    SearchIndexerIndexProjectionsParameters,
-    IndexProjectionMode,
-    SearchIndexerSkillset,
-    CognitiveServicesAccountKey,
-    SearchIndexer
-)
 import os
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+from utility.index_generation import IndexGeneration
+
+if TYPE_CHECKING:
+    from azure.search.documents import SearchClient
+
+# The Azure AI Search SDK and its model classes are imported by the methods that
+# use them, so running only the indexer or the local pipeline doesn't load them all
 
 class SearchServiceManager:
     def __init__(self):
         # Load environment variables from .env file
         load_dotenv()
+        from azure.core.credentials import AzureKeyCredential
 
         # Retrieve configuration from environment variables
         self.search_endpoint = os.environ["AZURE_SEARCH_SERVICE_ENDPOINT"]
@@ -46,15 +29,28 @@ class SearchServiceManager:
         self.azure_openai_key = os.environ["AZURE_OPENAI_KEY_FOR_EMBEDDING"]
         self.blob_connection_string = os.environ["AZURE_BLOB_CONNECTION_STRING"]
         self.blob_container_name = os.environ["AZURE_BLOB_CONTAINER"]
+        # text-embedding-3 vector length; must match the Embedder used for queries
+        self.embedding_dimension = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
     # Create a search index with vector search capabilities
     def create_search_index(self):
+        from azure.search.documents.indexes import SearchIndexClient
+        from azure.search.documents.indexes.models import (
+            SearchField,
+            SearchFieldDataType,
+            VectorSearch,
+            HnswAlgorithmConfiguration,
+            VectorSearchProfile,
+            AzureOpenAIVectorizer,
+            AzureOpenAIVectorizerParameters,
+            SearchIndex
+        )
         index_client = SearchIndexClient(endpoint=self.search_endpoint, credential=self.search_credential)  
         fields = [
             SearchField(name="parent_id", type=SearchFieldDataType.String),  
             SearchField(name="title", type=SearchFieldDataType.String),
             SearchField(name="chunk_id", type=SearchFieldDataType.String, key=True, sortable=True, filterable=True, facetable=True, analyzer_name="keyword"),  
             SearchField(name="chunk", type=SearchFieldDataType.String, sortable=False, filterable=False, facetable=False),  
-            SearchField(name="text_vector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single), vector_search_dimensions=1024, vector_search_profile_name="myHnswProfile")
+            SearchField(name="text_vector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single), vector_search_dimensions=self.embedding_dimension, vector_search_profile_name="myHnswProfile")
             ]
 
         # Configure the vector search configuration  
@@ -91,6 +87,8 @@ class SearchServiceManager:
 
     # Create a data source connection to Azure Blob Storage
     def create_data_source_connection(self):
+        from azure.search.documents.indexes import SearchIndexerClient
+        from azure.search.documents.indexes.models import SearchIndexerDataContainer, SearchIndexerDataSourceConnection
         indexer_client = SearchIndexerClient(endpoint=self.search_endpoint, credential=self.search_credential)
         container = SearchIndexerDataContainer(name=self.blob_container_name)
         print(f"creating the data source connection - {self.search_datasource}") 
@@ -106,6 +104,18 @@ class SearchServiceManager:
 
     # Create a skillset for data enrichment
     def create_skillset(self):
+        from azure.search.documents.indexes import SearchIndexerClient
+        from azure.search.documents.indexes.models import (
+            SplitSkill,
+            InputFieldMappingEntry,
+            OutputFieldMappingEntry,
+            AzureOpenAIEmbeddingSkill,
+            SearchIndexerIndexProjection,
+            SearchIndexerIndexProjectionSelector,
+            SearchIndexerIndexProjectionsParameters,
+            IndexProjectionMode,
+            SearchIndexerSkillset
+        )
         # Create a skillset  
         split_skill = SplitSkill(  
             description="Split skill to chunk documents",  
@@ -128,7 +138,7 @@ class SearchServiceManager:
             api_key= self.azure_openai_key,  
             deployment_name="text-embedding-3-large",  
             model_name="text-embedding-3-large",
-            dimensions=1024,
+            dimensions=self.embedding_dimension,
             inputs=[  
                 InputFieldMappingEntry(name="text", source="/document/pages/*"),  
             ],  
@@ -170,6 +180,8 @@ class SearchServiceManager:
 
     # Create an indexer to orchestrate data ingestion
     def create_indexer(self):
+        from azure.search.documents.indexes import SearchIndexerClient
+        from azure.search.documents.indexes.models import SearchIndexer
         # Create an indexer  
 
         indexer_parameters = None
@@ -196,10 +208,19 @@ class SearchServiceManager:
         self.create_data_source_connection()
         self.create_skillset()
         self.create_indexer()
+        # Cached search results for this index are stale from here on
+        IndexGeneration(self.search_index).bump()
     
+    def get_search_client(self) -> "SearchClient":
+        from azure.search.documents import SearchClient
+        # Client for pushing documents directly into the index
+        return SearchClient(endpoint=self.search_endpoint, index_name=self.search_index, credential=self.search_credential)
+
     def run_indexer(self):
+        from azure.search.documents.indexes import SearchIndexerClient
         indexer_client = SearchIndexerClient(endpoint=self.search_endpoint, credential=self.search_credential)  
         indexer_client.run_indexer(self.search_indexer)
+        IndexGeneration(self.search_index).bump()
         print(f' {self.search_indexer} is running. Give the indexer a few minutes before running a query.')
 
 
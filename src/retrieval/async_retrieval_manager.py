@@ -0,0 +1,128 @@
+import os
+import asyncio
+from pathlib import Path
+from typing import TYPE_CHECKING
+from dotenv import load_dotenv
+
+from retrieval.retrieval_manager import SearchType, build_search_kwargs, format_result, merge_shard_outcomes
+from retrieval.fusion import HYBRID_TEXT_CANDIDATES, reciprocal_rank_fusion
+
+if TYPE_CHECKING:
+    from utility.embedder import Embedder
+
+class AsyncRetrievalManager:
+    """
+    asyncio counterpart of RetrievalManager.
+
+    Many chat sessions can share one instance inside one event loop without a
+    thread per request. RetrievalManager remains the synchronous API for
+    existing callers; queries and the merging of several indexes are built by
+    the same helpers, so both return the same results.
+    """
+
+    def __init__(self, embedder: "Embedder" = None, overlap_hybrid: bool = True):
+        # Load environment variables from .env file
+        dotenv_path = Path(__file__).parent.parent / '.env'
+        load_dotenv(dotenv_path)
+        # The Azure SDK is imported on first use, like in RetrievalManager
+        from azure.core.credentials import AzureKeyCredential
+        from azure.search.documents.aio import SearchClient
+
+        self.search_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
+        self.search_index = os.getenv("AZURE_SEARCH_INDEX")
+        self.search_credential = AzureKeyCredential(os.getenv("AZURE_SEARCH_ADMIN_KEY",""))
+        # Several indexes are searched concurrently and merged, like RetrievalManager
+        search_indexes = [name.strip() for name in os.getenv("AZURE_SEARCH_INDEXES", "").split(",") if name.strip()]
+        self.search_clients = {
+            name: SearchClient(
+                endpoint=self.search_endpoint,
+                index_name=name,
+                credential=self.search_credential
+            )
+            for name in search_indexes or [self.search_index]
+        }
+        self.search_client = next(iter(self.search_clients.values()))
+        self.shard_timeout = float(os.getenv("SEARCH_SHARD_TIMEOUT_SECONDS", "2.0"))
+        if embedder is None:
+            from utility.embedder import Embedder
+            embedder = Embedder()
+        self.embedder = embedder
+        # HYBRID runs a text-only search while the query is being embedded and fuses it with
+        # the vector results client-side; False sends one server-side hybrid query instead
+        self.overlap_hybrid = overlap_hybrid
+
+    async def search_documents(self, query, top_k=5, search_type=SearchType.TEXT):
+        # Perform a search query against the Azure Search index
+        match search_type:
+            case SearchType.HYBRID:
+                if self.overlap_hybrid:
+                    return await self._overlapped_hybrid_search(query, top_k)
+                query_vector = await self.embedder.aembed_query(query)
+                return await self._search(search_type, build_search_kwargs(query, query_vector, top_k), top_k)
+            case SearchType.VECTOR:
+                query_vector = await self.embedder.aembed_query(query)
+                return await self._search(search_type, build_search_kwargs(None, query_vector, top_k), top_k)
+            case SearchType.TEXT:
+                return await self._search(search_type, build_search_kwargs(query, None, top_k), top_k)
+
+    async def _search(self, search_type, search_kwargs, top_k):
+        if len(self.search_clients) == 1:
+            return await self._search_index(self.search_client, search_kwargs)
+
+        # One slow or failing index degrades the results instead of stalling the turn
+        names = list(self.search_clients)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(self._search_index(self.search_clients[name], search_kwargs), self.shard_timeout)
+              for name in names),
+            return_exceptions=True
+        )
+        outcomes = {
+            name: TimeoutError(f"timed out after {self.shard_timeout}s") if isinstance(outcome, asyncio.TimeoutError)
+            else outcome
+            for name, outcome in zip(names, outcomes)
+        }
+        return merge_shard_outcomes(outcomes, top_k, search_type)[0]
+
+    @staticmethod
+    async def _search_index(search_client, search_kwargs):
+        results = await search_client.search(**search_kwargs)
+        return [format_result(doc) async for doc in results]
+
+    async def _overlapped_hybrid_search(self, query, top_k):
+        """
+        Hybrid search with the text leg overlapped with query embedding.
+
+        The text search and the embed-then-vector-search branch run concurrently
+        and are merged with Reciprocal Rank Fusion, the same fusion the service
+        applies to hybrid queries, over as many text candidates as the service
+        fuses. If the vector branch fails, the text results are returned on
+        their own rather than failing the turn.
+        """
+        async def vector_branch():
+            query_vector = await self.embedder.aembed_query(query)
+            return await self._search(SearchType.VECTOR, build_search_kwargs(None, query_vector, top_k), top_k)
+
+        text_candidates = max(top_k, HYBRID_TEXT_CANDIDATES)
+        text_results, vector_results = await asyncio.gather(
+            self._search(SearchType.TEXT, build_search_kwargs(query, None, text_candidates), text_candidates),
+            vector_branch(),
+            return_exceptions=True
+        )
+        if isinstance(text_results, BaseException):
+            raise text_results
+        if isinstance(vector_results, BaseException):
+            print(f"Vector search failed, returning text results only: {vector_results}")
+            return text_results[:top_k]
+        return reciprocal_rank_fusion([text_results, vector_results], top_k=top_k)
+
+    async def close(self):
+        for search_client in self.search_clients.values():
+            await search_client.close()
+        # The embedder may be shared; this only closes its client for the current event loop
+        await self.embedder.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
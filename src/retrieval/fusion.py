@@ -0,0 +1,77 @@
+from typing import Dict, List, Optional
+
+# Text results fused into a hybrid query's ranking, like Azure AI Search's default of 50
+HYBRID_TEXT_CANDIDATES = 50
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], weights: Optional[List[float]] = None,
+                           k: int = 60, top_k: Optional[int] = None) -> List[Dict]:
+    """
+    Merge ranked result lists with Reciprocal Rank Fusion.
+
+    Each document scores sum(weight / (k + rank)) over the lists it appears in,
+    the same scheme Azure AI Search uses for hybrid queries.
+
+    Args:
+        result_lists: Ranked lists of search results, each with a "chunk_id"
+        weights: Per-list weights, defaults to 1.0 for every list
+        k: RRF rank constant; larger values flatten the contribution of top ranks
+        top_k: Number of fused results to return, all of them if None
+
+    Returns:
+        Fused results ordered by descending fused score, stored in "score"
+    """
+    weights = weights or [1.0] * len(result_lists)
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for results, weight in zip(result_lists, weights):
+        for rank, doc in enumerate(results, start=1):
+            key = doc["chunk_id"]
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+            fused.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**fused[key], "score": scores[key]} for key in ranked]
+
+
+def normalize_scores(results: List[Dict], best: Optional[float] = None) -> List[Dict]:
+    """
+    Scale scores into 0..1 by dividing them by best.
+
+    The raw score is kept in "raw_score".
+
+    Args:
+        results: Results, each with a "score"
+        best: Score that maps to 1.0; defaults to the best score in results
+
+    Returns:
+        The same results with normalized scores, in the same order
+    """
+    if best is None:
+        best = max((doc["score"] for doc in results), default=0.0)
+    return [{**doc, "raw_score": doc["score"], "score": doc["score"] / best if best > 0 else 0.0} for doc in results]
+
+
+def merge_index_results(results_by_index: Dict[str, List[Dict]], top_k: int, normalize: bool = True) -> List[Dict]:
+    """
+    Merge the results of several indexes into one global top_k.
+
+    Results are ranked by their raw scores. Scaling each index by its own best
+    score would give every index's top hit 1.0, so the best match of an index
+    with nothing relevant would tie the best match of the index that has the
+    answer. Normalizing divides every score by the best score of any index,
+    which keeps that order and puts scores on a 0..1 scale.
+
+    Args:
+        results_by_index: Ranked results of each index that answered
+        top_k: Number of merged results to return
+        normalize: Scale scores to 0..1; the raw scores are kept in "raw_score"
+
+    Returns:
+        Results ordered by descending score, each tagged with its "index"
+    """
+    merged = [{**doc, "index": name} for name, results in results_by_index.items() for doc in results]
+    merged.sort(key=lambda doc: doc["score"], reverse=True)
+    if normalize:
+        merged = normalize_scores(merged)
+    return merged[:top_k]
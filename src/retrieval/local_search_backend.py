@@ -0,0 +1,142 @@
+from typing import Any, Dict, Iterable, List, Optional
+import os
+import re
+
+from retrieval.fusion import HYBRID_TEXT_CANDIDATES, reciprocal_rank_fusion
+from retrieval.local_text_index import LocalTextIndex
+from retrieval.local_vector_index import LocalVectorIndex
+
+# search.in(chunk_id, '<id>,<id>,...', ','), the only filter the local backend supports
+_KEY_FILTER = re.compile(r"^\s*search\.in\(\s*chunk_id\s*,\s*'([^']*)'\s*,\s*'([^']+)'\s*\)\s*$")
+
+
+def vector_index_options() -> Dict[str, Any]:
+    """LocalVectorIndex options from the LOCAL_INDEX_* and EMBEDDING_DIMENSION env variables."""
+    code_dimension = os.getenv("LOCAL_INDEX_CODE_DIMENSION")
+    rescore_factor = os.getenv("LOCAL_INDEX_RESCORE_FACTOR")
+    return {
+        "dimension": int(os.getenv("EMBEDDING_DIMENSION", "1024")),
+        "dtype": os.getenv("LOCAL_INDEX_DTYPE", "float32"),
+        "mode": os.getenv("LOCAL_INDEX_MODE", "exact"),
+        "codec": os.getenv("LOCAL_INDEX_CODEC") or None,
+        "code_dimension": int(code_dimension) if code_dimension else None,
+        "rescore_factor": int(rescore_factor) if rescore_factor else None
+    }
+
+
+class LocalSearchBackend:
+    """
+    Local stand-in for Azure AI Search combining a vector index and a BM25 index.
+
+    Text-only queries use BM25, vector-only queries use the vector index, and
+    queries with both are merged client-side with Reciprocal Rank Fusion using
+    tunable per-leg weights. Both indexes live in the same directory.
+    """
+
+    def __init__(self, path: str, text_weight: float = 1.0, vector_weight: float = 1.0,
+                 rrf_k: int = 60, text_candidates: int = HYBRID_TEXT_CANDIDATES, **vector_index_options):
+        """
+        Args:
+            path: Directory holding both indexes
+            text_weight: RRF weight of the BM25 ranking in hybrid queries
+            vector_weight: RRF weight of the vector ranking in hybrid queries
+            rrf_k: RRF rank constant
+            text_candidates: BM25 results fused in hybrid queries, like the service's default of 50
+            vector_index_options: Passed to LocalVectorIndex (dtype, mode, nlist, nprobe, codec, ...)
+        """
+        self.vector_index = LocalVectorIndex(path, **vector_index_options)
+        self.text_index = LocalTextIndex(path)
+        self.text_weight = text_weight
+        self.vector_weight = vector_weight
+        self.rrf_k = rrf_k
+        self.text_candidates = text_candidates
+
+    def search(self, search_text: Optional[str] = None, vector_queries: Optional[List[Dict]] = None,
+               top: Optional[int] = None, select: Optional[List[str]] = None, **kwargs) -> List[Dict]:
+        """
+        Search with the same arguments RetrievalManager passes to SearchClient.search.
+
+        A filter is only supported on its own, as search.in(chunk_id, ...) with a
+        match-all query, to fetch documents by key in one call.
+
+        Returns:
+            Matching documents with "@search.score", best first
+
+        Raises:
+            ValueError: If the filter is not a chunk_id search.in or is combined with a query
+        """
+        top = top or 50
+        has_text = search_text not in (None, "", "*")
+        if kwargs.get("filter"):
+            if has_text or vector_queries:
+                raise ValueError("The local backend only supports filters on match-all queries")
+            return self._filter_by_key(kwargs["filter"], top, select)
+        if not has_text:
+            return self.vector_index.search(vector_queries=vector_queries, top=top, select=select)
+
+        text_hits = self._text_search(search_text, max(top, self.text_candidates) if vector_queries else top, select)
+        if not vector_queries:
+            return text_hits[:top]
+
+        vector_hits = self.vector_index.search(vector_queries=vector_queries, top=None, select=select)
+        fused = reciprocal_rank_fusion(
+            [self._with_ids(text_hits), self._with_ids(vector_hits)],
+            weights=[self.text_weight, self.vector_weight],
+            k=self.rrf_k,
+            top_k=top
+        )
+        return [{**self._selected(hit, select), "@search.score": hit["score"]} for hit in fused]
+
+    def _text_search(self, search_text: str, top: int, select: Optional[List[str]]) -> List[Dict]:
+        hits = []
+        fields = list(dict.fromkeys((select or LocalVectorIndex.FIELDS) + ["chunk_id"]))
+        for chunk_id, score in self.text_index.search(search_text, top):
+            doc = self.vector_index.get_document(chunk_id, fields)
+            hits.append({**doc, "@search.score": score})
+        return hits
+
+    def _filter_by_key(self, filter: str, top: int, select: Optional[List[str]]) -> List[Dict]:
+        match = _KEY_FILTER.match(filter)
+        if match is None:
+            raise ValueError(f"Unsupported filter for the local backend: {filter}")
+        values, delimiter = match.groups()
+        fields = list(dict.fromkeys((select or LocalVectorIndex.FIELDS) + ["chunk_id"]))
+        hits = []
+        for key in dict.fromkeys(value.strip() for value in values.split(delimiter) if value.strip()):
+            try:
+                doc = self.vector_index.get_document(key, fields)
+            except KeyError:
+                continue
+            hits.append({**doc, "@search.score": 1.0})
+        return hits[:top]
+
+    @staticmethod
+    def _with_ids(hits: List[Dict]) -> List[Dict]:
+        return [hit for hit in hits if hit.get("chunk_id") is not None]
+
+    @staticmethod
+    def _selected(hit: Dict, select: Optional[List[str]]) -> Dict:
+        fields = select or LocalVectorIndex.FIELDS
+        return {field: hit.get(field) for field in fields}
+
+    def upload_documents(self, documents: Iterable[Dict]) -> List[Dict]:
+        documents = list(documents)
+        self.text_index.upload_documents(documents)
+        return self.vector_index.upload_documents(documents)
+
+    merge_or_upload_documents = upload_documents
+
+    def delete_documents(self, documents: Iterable[Dict]) -> List[Dict]:
+        documents = list(documents)
+        self.text_index.delete_documents(documents)
+        return self.vector_index.delete_documents(documents)
+
+    def get_document(self, key: str, selected_fields: Optional[List[str]] = None) -> Dict:
+        return self.vector_index.get_document(key, selected_fields)
+
+    def get_document_count(self) -> int:
+        return self.vector_index.get_document_count()
+
+    def save(self):
+        self.vector_index.save()
+        self.text_index.save()
@@ -0,0 +1,220 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import re
+import json
+import math
+from array import array
+from collections import Counter
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class LocalTextIndex:
+    """
+    On-disk BM25 inverted index over chunk text, keyed by chunk_id.
+
+    Postings are stored as flat int32 arrays (document numbers and term
+    frequencies) with a term dictionary pointing into them, and are memory-mapped
+    on load. Documents added or deleted after loading are kept in an in-memory
+    delta and tombstone mask until save() merges and compacts them. A query
+    only touches the postings of its terms, not every document.
+
+    Files under path:
+        bm25_terms.json        term -> [offset, length] into the postings arrays
+        bm25_postings.npy      document numbers, grouped by term
+        bm25_frequencies.npy   term frequency for each posting
+        bm25_lengths.npy       token count of each document
+        bm25_chunk_ids.json    chunk_id of each document number
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = str(path)
+        self.k1 = k1
+        self.b = b
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        self._terms: Dict[str, Tuple[int, int]] = {}
+        self._postings = np.zeros(0, dtype=np.int32)
+        self._frequencies = np.zeros(0, dtype=np.int32)
+        lengths = np.zeros(0, dtype=np.int32)
+        self._chunk_ids: List[Optional[str]] = []
+        if os.path.exists(self._file("bm25_terms.json")):
+            with open(self._file("bm25_terms.json"), encoding="utf-8") as f:
+                self._terms = {term: tuple(entry) for term, entry in json.load(f).items()}
+            self._postings = np.load(self._file("bm25_postings.npy"), mmap_mode="r")
+            self._frequencies = np.load(self._file("bm25_frequencies.npy"), mmap_mode="r")
+            lengths = np.load(self._file("bm25_lengths.npy"))
+            with open(self._file("bm25_chunk_ids.json"), encoding="utf-8") as f:
+                self._chunk_ids = json.load(f)
+
+        # Per-document arrays with room to grow, so searches index them in place
+        count = len(self._chunk_ids)
+        self._lengths = np.zeros(max(16, count), dtype=np.int32)
+        self._lengths[:count] = lengths
+        self._deleted = np.zeros(len(self._lengths), dtype=bool)
+        self._doc_by_id = {chunk_id: doc for doc, chunk_id in enumerate(self._chunk_ids)}
+        # Postings of documents added since the last save: term -> (doc numbers, frequencies)
+        self._delta: Dict[str, Tuple[array, array]] = {}
+        self._live_count = len(self._chunk_ids)
+        self._total_length = int(lengths.sum())
+
+    # ---- Updates ----
+
+    def add(self, chunk_id: str, text: str):
+        """Index a document, replacing any existing document with the same chunk_id."""
+        self.delete(chunk_id)
+        doc = len(self._chunk_ids)
+        if doc == len(self._lengths):
+            # Doubling keeps adds amortized O(1); a running search keeps reading the old arrays
+            self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+            self._deleted = np.concatenate([self._deleted, np.zeros_like(self._deleted)])
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        # Set before the postings, which are what make the document visible to searches
+        self._lengths[doc] = length
+        self._deleted[doc] = False
+        self._chunk_ids.append(chunk_id)
+        self._doc_by_id[chunk_id] = doc
+        for term, frequency in counts.items():
+            docs, frequencies = self._delta.setdefault(term, (array("i"), array("i")))
+            docs.append(doc)
+            frequencies.append(frequency)
+        self._live_count += 1
+        self._total_length += length
+
+    def delete(self, chunk_id: str) -> bool:
+        doc = self._doc_by_id.pop(chunk_id, None)
+        if doc is None:
+            return False
+        self._deleted[doc] = True
+        self._live_count -= 1
+        self._total_length -= int(self._lengths[doc])
+        return True
+
+    def upload_documents(self, documents: Iterable[Dict]) -> List[Dict]:
+        # Title and chunk are both searchable, as in the Azure index
+        results = []
+        for doc in documents:
+            self.add(doc["chunk_id"], f"{doc.get('title') or ''} {doc.get('chunk') or ''}")
+            results.append({"key": doc["chunk_id"], "succeeded": True})
+        return results
+
+    def delete_documents(self, documents: Iterable[Dict]) -> List[Dict]:
+        return [{"key": doc["chunk_id"], "succeeded": self.delete(doc["chunk_id"])} for doc in documents]
+
+    def save(self):
+        """Merge the in-memory delta into the postings files and drop deleted documents."""
+        deleted = self._deleted[:len(self._chunk_ids)]
+        # Renumber live documents densely
+        new_numbers = np.cumsum(~deleted) - 1
+        terms = sorted(set(self._terms) | set(self._delta))
+        postings, frequencies, entries = [], [], {}
+        offset = 0
+        for term in terms:
+            term_docs, term_frequencies = self._postings_for(term)
+            live = ~deleted[term_docs]
+            if not live.any():
+                continue
+            term_docs = new_numbers[term_docs[live]].astype(np.int32)
+            postings.append(term_docs)
+            frequencies.append(term_frequencies[live].astype(np.int32))
+            entries[term] = [offset, len(term_docs)]
+            offset += len(term_docs)
+
+        os.makedirs(self.path, exist_ok=True)
+        lengths = self._lengths[:len(self._chunk_ids)][~deleted]
+        chunk_ids = [chunk_id for chunk_id, dead in zip(self._chunk_ids, deleted) if not dead]
+        arrays = {
+            "bm25_postings.npy": np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32),
+            "bm25_frequencies.npy": np.concatenate(frequencies) if frequencies else np.zeros(0, dtype=np.int32),
+            "bm25_lengths.npy": lengths
+        }
+        for name, values in arrays.items():
+            with open(self._file(name + ".tmp"), "wb") as f:
+                np.save(f, values)
+        with open(self._file("bm25_chunk_ids.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(chunk_ids, f)
+        with open(self._file("bm25_terms.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+        self._postings = self._frequencies = None
+        # The terms file is replaced last, it is what marks the new files as complete
+        for name in list(arrays) + ["bm25_chunk_ids.json", "bm25_terms.json"]:
+            os.replace(self._file(name + ".tmp"), self._file(name))
+        self._load()
+
+    # ---- Search ----
+
+    def _postings_for(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        docs, frequencies = [], []
+        entry = self._terms.get(term)
+        if entry is not None:
+            offset, length = entry
+            docs.append(np.asarray(self._postings[offset:offset + length]))
+            frequencies.append(np.asarray(self._frequencies[offset:offset + length]))
+        delta = self._delta.get(term)
+        if delta is not None:
+            # Copies, so the arrays can keep growing while a search is running
+            docs.append(np.array(delta[0], dtype=np.int32))
+            frequencies.append(np.array(delta[1], dtype=np.int32))
+        if not docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        return np.concatenate(docs).astype(np.int64), np.concatenate(frequencies)
+
+    def search(self, query: str, top_k: int = 50) -> List[Tuple[str, float]]:
+        """
+        Rank documents for a query with BM25.
+
+        Deleted documents are left out of the postings before scoring, so
+        document frequencies only count live documents.
+
+        Args:
+            query: Query text
+            top_k: Number of results
+
+        Returns:
+            (chunk_id, BM25 score) pairs, best first
+        """
+        if self._live_count == 0:
+            return []
+        lengths, deleted = self._lengths, self._deleted
+        average_length = self._total_length / self._live_count or 1.0
+        matched_docs, matched_scores = [], []
+        for term in set(tokenize(query)):
+            docs, frequencies = self._postings_for(term)
+            live = ~deleted[docs]
+            docs, frequencies = docs[live], frequencies[live]
+            if len(docs) == 0:
+                continue
+            idf = math.log(1.0 + (self._live_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = frequencies.astype(np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[docs] / average_length)
+            matched_docs.append(docs)
+            matched_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        if not matched_docs:
+            return []
+
+        # Sum each document's scores over the query terms
+        candidates, positions = np.unique(np.concatenate(matched_docs), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(matched_scores)).astype(np.float32)
+        keep = np.flatnonzero(scores > 0)
+        if len(keep) > top_k:
+            keep = keep[np.argpartition(-scores[keep], top_k - 1)[:top_k]]
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        return [(self._chunk_ids[candidates[i]], float(scores[i])) for i in keep]
+
+    def __len__(self) -> int:
+        return self._live_count
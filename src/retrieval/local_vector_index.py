@@ -0,0 +1,452 @@
+from typing import Dict, Iterable, List, Optional
+import os
+import json
+import mmap
+
+import numpy as np
+
+from retrieval.vector_codecs import CODECS, VectorCodec, make_codec
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index over the same schema as the Azure AI Search index
+    (chunk_id, parent_id, title, chunk, text_vector).
+
+    Vectors live in a memory-mapped .npy file, so opening a large index is
+    instant and worker processes share the same pages. search() accepts the
+    same arguments RetrievalManager passes to SearchClient.search, so the index
+    can stand in for the search service.
+
+    With a codec, stored rows are first ranked by compact codes (float16,
+    int8 or binary, optionally of reduced dimension), and only the best
+    k * rescore_factor are rescored with the full vectors. Searches then read
+    the codes and a few full rows instead of the whole vector file.
+
+    Files under path:
+        vectors.npy          N x D unit-length vectors, float32 or float16
+        docs.jsonl           one JSON document per vector row
+        doc_offsets.npy      byte offsets of each row in docs.jsonl
+        chunk_ids.json       chunk_id of each row, for key lookups
+        ivf_centroids.npy    IVF cluster centroids (approximate mode only)
+        ivf_assignments.npy  IVF cluster of each row (approximate mode only)
+        codes_<codec>_<D>.npy  compact code of each row (with a codec only)
+        codec_<codec>_<D>.json parameters of the codec that wrote the codes
+    """
+
+    FIELDS = ["chunk_id", "parent_id", "title", "chunk"]
+
+    def __init__(self, path: str, dimension: int = 1024, dtype: str = "float32",
+                 mode: str = "exact", nlist: Optional[int] = None, nprobe: int = 8,
+                 codec: Optional[str] = None, code_dimension: Optional[int] = None,
+                 rescore_factor: Optional[int] = None):
+        """
+        Open (or prepare to create) a local vector index.
+
+        Args:
+            path: Directory holding the index files
+            dimension: Vector length, 1024 to match the Azure index
+            dtype: Storage type for vectors, "float32" or "float16"
+            mode: "exact" for a full scan, "ivf" for approximate inverted-file search
+            nlist: Number of IVF clusters, defaults to sqrt(N)
+            nprobe: Number of IVF clusters scanned per query
+            codec: Compact codes for the first search phase, "binary", "int8" or "float16";
+                None scans the full vectors
+            code_dimension: Leading vector components kept in the codes, defaults to the codec's
+                (all of them for binary, half for int8 and float16)
+            rescore_factor: Candidates per requested result rescored with the full vectors,
+                defaults to the codec's (40 for binary, 20 for int8 and float16)
+        """
+        if mode not in ("exact", "ivf"):
+            raise ValueError(f"Unknown index mode '{mode}', expected 'exact' or 'ivf'")
+        self.path = str(path)
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        if codec is not None:
+            make_codec(codec, 1)  # Fail early on unknown names
+        self.codec = codec
+        self.code_dimension = code_dimension
+        if rescore_factor is None:
+            rescore_factor = CODECS[codec].default_rescore_factor if codec is not None else 1
+        self.rescore_factor = max(1, rescore_factor)
+        self.block_size = 65536  # Rows scored per matrix product, bounds temporary memory
+        self.code_block_size = 2048  # Codes are widened to float32 per block; small blocks stay in cache
+        self._load()
+
+    # ---- Loading and persistence ----
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        self._vectors = np.zeros((0, self.dimension), dtype=self.dtype)
+        self._doc_offsets = np.zeros(1, dtype=np.int64)
+        self._docs_map = None
+        self._centroids = None
+        self._ivf_order = None
+        self._ivf_bounds = None
+        self._codec: Optional[VectorCodec] = None
+        self._codes = None
+        if os.path.exists(self._file("vectors.npy")):
+            self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+            self.dimension = self._vectors.shape[1]
+            self._doc_offsets = np.load(self._file("doc_offsets.npy"))
+            if len(self._vectors) > 0:
+                with open(self._file("docs.jsonl"), "rb") as f:
+                    self._docs_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.mode == "ivf" and os.path.exists(self._file("ivf_centroids.npy")):
+                self._centroids = np.load(self._file("ivf_centroids.npy"))
+                assignments = np.load(self._file("ivf_assignments.npy"))
+                # Group rows by cluster once, so each probe is a contiguous slice
+                self._ivf_order = np.argsort(assignments, kind="stable")
+                self._ivf_bounds = np.searchsorted(assignments[self._ivf_order], np.arange(len(self._centroids) + 1))
+            if self.codec is not None and len(self._vectors) > 0:
+                self._load_codes()
+
+        self._deleted = np.zeros(len(self._vectors), dtype=bool)
+        self._row_by_id = None
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_docs: List[Optional[Dict]] = []  # None marks a pending row deleted again
+        self._pending_by_id: Dict[str, int] = {}
+
+    def _code_dimension(self) -> int:
+        if self.code_dimension is None:
+            return CODECS[self.codec].default_code_dimension(self.dimension)
+        return min(self.code_dimension, self.dimension)
+
+    def _codes_name(self) -> str:
+        return f"{self.codec}_{self._code_dimension()}"
+
+    def _load_codes(self):
+        # Codes are built on first open with a new codec, and rebuilt by save()
+        codes_file = self._file(f"codes_{self._codes_name()}.npy")
+        codec_file = self._file(f"codec_{self._codes_name()}.json")
+        if not os.path.exists(codes_file):
+            self._build_codes()
+        with open(codec_file, encoding="utf-8") as f:
+            state = json.load(f)
+        codes = np.load(codes_file, mmap_mode="r")
+        if len(codes) != len(self._vectors):
+            self._build_codes()
+            return self._load_codes()
+        self._codec = make_codec(state["codec"], state["dimension"], state)
+        self._codes = codes
+
+    def _build_codes(self, sample_size: int = 50000, seed: int = 0):
+        vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+        count = len(vectors)
+        codec = make_codec(self.codec, self._code_dimension())
+        rng = np.random.default_rng(seed)
+        codec.fit(vectors[np.sort(rng.choice(count, size=min(sample_size, count), replace=False))])
+        name = self._codes_name()
+        codes = np.lib.format.open_memmap(self._file(f"codes_{name}.npy.tmp"), mode="w+", dtype=codec.code_dtype,
+                                          shape=(count, codec.code_size))
+        for start in range(0, count, self.block_size):
+            codes[start:start + self.block_size] = codec.encode(vectors[start:start + self.block_size])
+        codes.flush()
+        del codes
+        with open(self._file(f"codec_{name}.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(codec.state(), f)
+        os.replace(self._file(f"codes_{name}.npy.tmp"), self._file(f"codes_{name}.npy"))
+        os.replace(self._file(f"codec_{name}.json.tmp"), self._file(f"codec_{name}.json"))
+
+    def footprint(self) -> Dict[str, int]:
+        """Bytes of stored full vectors, and of the codes scanned per query when a codec is set."""
+        return {
+            "vectors": int(self._vectors.nbytes),
+            "codes": int(self._codes.nbytes) if self._codes is not None else 0
+        }
+
+    def _stored_doc(self, row: int) -> Dict:
+        start, end = self._doc_offsets[row], self._doc_offsets[row + 1]
+        return json.loads(self._docs_map[start:end])
+
+    def _row_index(self) -> Dict[str, int]:
+        # chunk_id -> row map, only built when writes or key lookups need it
+        if self._row_by_id is None:
+            if len(self._vectors) == 0:
+                chunk_ids = []
+            else:
+                with open(self._file("chunk_ids.json"), encoding="utf-8") as f:
+                    chunk_ids = json.load(f)
+            self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+        return self._row_by_id
+
+    def save(self):
+        """Persist pending uploads and deletions, compacting the index files."""
+        live_rows = np.flatnonzero(~self._deleted)
+        pending = [i for i, doc in enumerate(self._pending_docs) if doc is not None]
+        count = len(live_rows) + len(pending)
+        os.makedirs(self.path, exist_ok=True)
+
+        vectors = np.lib.format.open_memmap(self._file("vectors.npy.tmp"), mode="w+", dtype=self.dtype,
+                                            shape=(count, self.dimension))
+        for start in range(0, len(live_rows), self.block_size):
+            rows = live_rows[start:start + self.block_size]
+            vectors[start:start + len(rows)] = self._vectors[rows]
+        if pending:
+            vectors[len(live_rows):] = np.stack([self._pending_vectors[i] for i in pending])
+        vectors.flush()
+        del vectors
+
+        row_index = self._row_index()
+        chunk_ids = [None] * len(self._vectors)
+        for chunk_id, row in row_index.items():
+            chunk_ids[row] = chunk_id
+        chunk_ids = [chunk_ids[row] for row in live_rows] + [self._pending_docs[i]["chunk_id"] for i in pending]
+        with open(self._file("chunk_ids.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(chunk_ids, f)
+
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        with open(self._file("docs.jsonl.tmp"), "wb") as docs_file:
+            position = 0
+            lines = (self._docs_map[self._doc_offsets[row]:self._doc_offsets[row + 1]] for row in live_rows)
+            pending_lines = (json.dumps(self._pending_docs[i]).encode("utf-8") + b"\n" for i in pending)
+            for out_row, line in enumerate(lines):
+                docs_file.write(line)
+                position += len(line)
+                offsets[out_row + 1] = position
+            for out_row, line in enumerate(pending_lines, start=len(live_rows)):
+                docs_file.write(line)
+                position += len(line)
+                offsets[out_row + 1] = position
+        with open(self._file("doc_offsets.npy.tmp"), "wb") as offsets_file:
+            np.save(offsets_file, offsets)
+
+        # Replace files atomically; processes with the old files mapped keep a consistent view.
+        # Drop our own mappings first, Windows refuses to replace a mapped file.
+        self._vectors = None
+        self._codes = None
+        if self._docs_map is not None:
+            self._docs_map.close()
+        for name in ("vectors.npy", "docs.jsonl", "chunk_ids.json", "doc_offsets.npy"):
+            os.replace(self._file(name + ".tmp"), self._file(name))
+        if self.mode == "ivf":
+            self._train_ivf()
+        # Codes of other codecs no longer match the rows
+        for name in os.listdir(self.path):
+            if name.startswith(("codes_", "codec_")):
+                os.remove(self._file(name))
+        if self.codec is not None and count:
+            self._build_codes()
+        self._load()
+
+    def _train_ivf(self, iterations: int = 10, sample_size: int = 50000, seed: int = 0):
+        # Spherical k-means on a sample, then assign every row to its nearest centroid
+        vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+        count = len(vectors)
+        if count == 0:
+            return
+        nlist = min(self.nlist or max(1, int(np.sqrt(count))), count)
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(count, size=min(sample_size, count), replace=False))].astype(np.float32)
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[labels == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        assignments = np.empty(count, dtype=np.int32)
+        for start in range(0, count, self.block_size):
+            block = np.asarray(vectors[start:start + self.block_size], dtype=np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        np.save(self._file("ivf_centroids.npy"), centroids)
+        np.save(self._file("ivf_assignments.npy"), assignments)
+
+    # ---- SearchClient-compatible document operations ----
+
+    def upload_documents(self, documents: Iterable[Dict]) -> List[Dict]:
+        """
+        Add or replace documents; changes are searchable at once and persisted by save().
+
+        Args:
+            documents: Documents in the index schema, including text_vector
+
+        Returns:
+            One status entry per document, like SearchClient.upload_documents
+        """
+        results = []
+        for doc in documents:
+            vector = np.asarray(doc["text_vector"], dtype=np.float32)
+            if vector.shape != (self.dimension,):
+                raise ValueError(f"Expected a {self.dimension}-dimensional text_vector for {doc['chunk_id']}")
+            self._delete_key(doc["chunk_id"])
+            self._pending_by_id[doc["chunk_id"]] = len(self._pending_docs)
+            self._pending_vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+            self._pending_docs.append({field: doc.get(field) for field in self.FIELDS})
+            results.append({"key": doc["chunk_id"], "succeeded": True})
+        return results
+
+    merge_or_upload_documents = upload_documents
+
+    def delete_documents(self, documents: Iterable[Dict]) -> List[Dict]:
+        """
+        Delete documents by chunk_id.
+
+        Args:
+            documents: Dicts with a chunk_id, like SearchClient.delete_documents
+
+        Returns:
+            One status entry per document
+        """
+        return [{"key": doc["chunk_id"], "succeeded": self._delete_key(doc["chunk_id"])} for doc in documents]
+
+    def _delete_key(self, chunk_id: str) -> bool:
+        found = False
+        row = self._row_index().get(chunk_id)
+        if row is not None and not self._deleted[row]:
+            self._deleted[row] = True
+            found = True
+        pending = self._pending_by_id.pop(chunk_id, None)
+        if pending is not None:
+            self._pending_docs[pending] = None
+            found = True
+        return found
+
+    def get_document(self, key: str, selected_fields: Optional[List[str]] = None) -> Dict:
+        """
+        Fetch one document by chunk_id, including its text_vector.
+
+        Raises:
+            KeyError: If no document has this chunk_id
+        """
+        pending = self._pending_by_id.get(key)
+        if pending is not None:
+            doc, vector = self._pending_docs[pending], self._pending_vectors[pending]
+        else:
+            row = self._row_index().get(key)
+            if row is None or self._deleted[row]:
+                raise KeyError(key)
+            doc, vector = self._stored_doc(row), np.asarray(self._vectors[row], dtype=np.float32)
+        doc = {**doc, "text_vector": vector.tolist()}
+        return {field: doc.get(field) for field in selected_fields} if selected_fields else doc
+
+    def get_document_count(self) -> int:
+        return int((~self._deleted).sum()) + sum(1 for doc in self._pending_docs if doc is not None)
+
+    def __len__(self) -> int:
+        return self.get_document_count()
+
+    # ---- Search ----
+
+    def search(self, search_text: Optional[str] = None, vector_queries: Optional[List[Dict]] = None,
+               top: Optional[int] = None, select: Optional[List[str]] = None, **kwargs) -> List[Dict]:
+        """
+        Vector search with the same arguments RetrievalManager passes to SearchClient.search.
+
+        Returns:
+            Matching documents with "@search.score", best first
+        """
+        if search_text not in (None, "*") or not vector_queries:
+            raise ValueError("LocalVectorIndex only supports vector queries")
+        query = vector_queries[0]
+        k = query.get("k") or query.get("k_nearest_neighbors") or top or 50
+        hits = self.search_vector(query["vector"], k)[:top or k]
+        return [self._format_hit(row, score, select) for row, score in hits]
+
+    def search_vector(self, vector: List[float], k: int) -> List[tuple]:
+        """
+        Nearest neighbours of a vector by cosine similarity.
+
+        Args:
+            vector: Query vector
+            k: Number of neighbours
+
+        Returns:
+            (row, cosine similarity) pairs, best first; pending rows are encoded as -1 - i
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        rows, scores = self._search_stored(query, k)
+        if self._pending_vectors:
+            live = [i for i, doc in enumerate(self._pending_docs) if doc is not None]
+            if live:
+                pending_scores = np.stack([self._pending_vectors[i] for i in live]) @ query
+                rows = np.concatenate([rows, -1 - np.asarray(live, dtype=np.int64)])
+                scores = np.concatenate([scores, pending_scores])
+
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(rows[i]), float(scores[i])) for i in order]
+
+    def _search_stored(self, query: np.ndarray, k: int):
+        if len(self._vectors) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        candidates = None
+        if self.mode == "ivf" and self._centroids is not None:
+            probes = np.argsort(-(self._centroids @ query))[:self.nprobe]
+            candidates = np.concatenate([
+                self._ivf_order[self._ivf_bounds[c]:self._ivf_bounds[c + 1]] for c in probes
+            ])
+            candidates.sort()  # Sequential reads from the memory-mapped file
+
+        if self._codes is None:
+            rows, scores = self._scan(self._vectors, candidates, lambda block: np.asarray(block, dtype=np.float32) @ query,
+                                      self.block_size)
+            return self._top_live(rows, scores, k)
+
+        # Phase 1: rank by the compact codes and keep a shortlist
+        prepared = self._codec.prepare_query(query)
+        rows, scores = self._scan(self._codes, candidates, lambda block: self._codec.scores(block, prepared),
+                                  self.code_block_size)
+        rows, _ = self._top_live(rows, scores, k * self.rescore_factor)
+        # Phase 2: exact similarity of the shortlist from the full vectors
+        rows.sort()
+        scores = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+        return self._top_live(rows, scores, k)
+
+    def _scan(self, matrix, candidates: Optional[np.ndarray], score, block_size: int):
+        # Scores candidate rows, or every row in blocks of block_size
+        if candidates is not None:
+            return candidates, score(matrix[candidates])
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), block_size):
+            block = matrix[start:start + block_size]
+            scores[start:start + len(block)] = score(block)
+        return np.arange(len(matrix)), scores
+
+    def _top_live(self, rows: np.ndarray, scores: np.ndarray, k: int):
+        live = ~self._deleted[rows]
+        rows, scores = rows[live], scores[live]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[top], scores[top]
+        return rows.astype(np.int64), scores
+
+    def _format_hit(self, row: int, similarity: float, select: Optional[List[str]]) -> Dict:
+        doc = self._pending_docs[-1 - row] if row < 0 else self._stored_doc(row)
+        fields = select or self.FIELDS
+        hit = {field: doc.get(field) for field in fields}
+        # Same scale as Azure AI Search for cosine: 1 / (1 + cosine distance)
+        hit["@search.score"] = 1.0 / (1.0 + (1.0 - similarity))
+        return hit
+
+
+def export_search_index(search_client, index: LocalVectorIndex, batch_size: int = 1000) -> int:
+    """
+    Copy every document of an Azure AI Search index into a local index.
+
+    Args:
+        search_client: SearchClient for the source index
+        index: Destination local index
+        batch_size: Documents buffered between uploads
+
+    Returns:
+        Number of documents copied
+    """
+    results = search_client.search(search_text="*", select=LocalVectorIndex.FIELDS + ["text_vector"])
+    batch, copied = [], 0
+    for doc in results:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            copied += len(index.upload_documents(batch))
+            batch = []
+    copied += len(index.upload_documents(batch))
+    index.save()
+    return copied
@@ -0,0 +1,124 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from utility.index_generation import IndexGeneration
+
+
+class SearchResultCache:
+    """
+    In-memory LRU cache of search results with a time-to-live.
+
+    Entries are keyed by (normalized query, top_k, search type). When an
+    IndexGeneration is given, the whole cache is dropped as soon as the
+    generation moves, i.e. after an ingestion or indexer run. Indexer runs
+    finish minutes after they are started, so the TTL bounds how long results
+    from before the run finished can be served.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0,
+                 generation: Optional[IndexGeneration] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.generation = generation
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._generation_value = generation.current() if generation else 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        # Case, Unicode form, whitespace and trailing punctuation don't change what users are asking
+        text = " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+        return text.rstrip("?!. ")
+
+    def make_key(self, query: str, top_k: int, search_type) -> Tuple:
+        return (self.normalize(query), top_k, getattr(search_type, "name", search_type))
+
+    def _check_generation(self):
+        if self.generation is None:
+            return
+        value = self.generation.current()
+        if value != self._generation_value:
+            self._entries.clear()
+            self._generation_value = value
+            self.invalidations += 1
+
+    def get(self, key: Tuple) -> Optional[List[Dict]]:
+        with self._lock:
+            self._check_generation()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        # Copies, so callers can't modify the cached results
+        return [dict(result) for result in results]
+
+    def put(self, key: Tuple, results: List[Dict]):
+        with self._lock:
+            self._check_generation()
+            self._entries[key] = (time.monotonic(), [dict(result) for result in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_search(self, query: str, top_k: int, search_type,
+                      search: Callable[[], Tuple[List[Dict], bool]]) -> List[Dict]:
+        """
+        Return cached results for the query, or run the search and cache them.
+
+        Args:
+            query: Query text
+            top_k: Number of results
+            search_type: SearchType of the query
+            search: Called on a miss to produce the results and whether they may be
+                cached; incomplete results, e.g. with an index left out, are not
+
+        Returns:
+            List of result dicts
+        """
+        start = time.perf_counter()
+        key = self.make_key(query, top_k, search_type)
+        results = self.get(key)
+        if results is not None:
+            with self._lock:
+                self.hits += 1
+                self.hit_seconds += time.perf_counter() - start
+            return results
+        results, cacheable = search()
+        if cacheable:
+            self.put(key, results)
+        with self._lock:
+            self.misses += 1
+            self.miss_seconds += time.perf_counter() - start
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "avg_hit_ms": 1000 * self.hit_seconds / self.hits if self.hits else 0.0,
+            "avg_miss_ms": 1000 * self.miss_seconds / self.misses if self.misses else 0.0,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "invalidations": self.invalidations
+        }
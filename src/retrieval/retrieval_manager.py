@@ -1,14 +1,22 @@
 
 import os
 import sys
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from azure.core.credentials import AzureKeyCredential
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
-from azure.search.documents import SearchClient
 from enum import Enum
 
-from utility.embedder import Embedder
+from utility.index_generation import generation_of
+from utility import metrics
+from retrieval.fusion import merge_index_results
+from retrieval.result_cache import SearchResultCache
+
+if TYPE_CHECKING:
+    from utility.embedder import Embedder
 
 #define an enum for search types if needed in future
 class SearchType(Enum):
@@ -16,16 +24,81 @@ class SearchType(Enum):
     VECTOR = 2
     HYBRID = 3
 
+SELECT_FIELDS = ["title", "chunk", "chunk_id", "parent_id"]
+
+def format_result(doc) -> dict:
+    # Shape a raw search hit into the result dict returned by search_documents
+    return {
+        "title": doc.get("title", ""),
+        "chunk": doc.get("chunk", ""),
+        "chunk_id": doc.get("chunk_id", 0),
+        "parent_id": doc.get("parent_id", 0),
+        "score": doc.get("@search.score", 0.0)
+    }
+
+def build_search_kwargs(search_text, query_vector, top_k) -> dict:
+    # Arguments of SearchClient.search for a text, vector or (with both) hybrid query
+    search_kwargs = {"search_text": search_text, "top": top_k, "select": SELECT_FIELDS}
+    if query_vector is not None:
+        search_kwargs["vector_queries"] = [{
+            "kind": "vector",
+            "vector": query_vector,
+            "k": top_k,
+            "fields": "text_vector"
+        }]
+    return search_kwargs
+
+def merge_shard_outcomes(outcomes: dict, top_k, search_type):
+    """
+    Merge the results of a search fanned out across several indexes into one global top_k.
+
+    Results are merged by score (see fusion.merge_index_results). Text and
+    hybrid scores are scaled to 0..1 by the best score across all indexes,
+    with the raw score kept in "raw_score"; vector scores are cosine-based
+    and merged as they are. Indexes that failed or missed the shard timeout
+    are left out with a warning; the search only fails if no index answered.
+
+    Args:
+        outcomes: Index name -> its results, or the exception its search raised
+        top_k: Number of merged results
+        search_type: SearchType of the query
+
+    Returns:
+        The merged results, and whether any index was left out
+    """
+    results_by_index, errors = {}, []
+    for name, outcome in outcomes.items():
+        if isinstance(outcome, BaseException):
+            errors.append(outcome)
+            print(f"Search of index '{name}' failed, continuing without it: {outcome}")
+        else:
+            results_by_index[name] = outcome
+    if not results_by_index:
+        raise errors[0]
+    merged = merge_index_results(results_by_index, top_k, normalize=search_type != SearchType.VECTOR)
+    return merged, bool(errors)
+
 class RetrievalManager:
     #Constructor and methods for RetrievalManager
-    def __init__(self):
+    def __init__(self, embedder: "Embedder" = None, transport=None, search_client=None,
+                 result_cache: SearchResultCache = None, search_clients: dict = None):
+        # embedder and transport can be shared across managers (see utility.component_registry).
+        # search_client may be any backend with SearchClient's search() signature.
+        # search_clients maps index names to such backends to fan out across several indexes.
+        # result_cache defaults to one configured from SEARCH_CACHE_* env variables
         # Load environment variables from .env file
         dotenv_path = Path(__file__).parent.parent / '.env'
         load_dotenv(dotenv_path)
+        # The Azure SDK is imported on first use, so importing this module (e.g. for SearchType) stays cheap
+        from azure.core.credentials import AzureKeyCredential
         
         #Load env variables and config
         self.search_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
         self.search_index = os.getenv("AZURE_SEARCH_INDEX")
+        # Indexes searched together, e.g. one per department or document collection
+        self.search_indexes = [name.strip() for name in os.getenv("AZURE_SEARCH_INDEXES", "").split(",") if name.strip()]
+        if len(self.search_indexes) == 1:
+            self.search_index = self.search_indexes[0]
         self.search_datasource = os.getenv("AZURE_SEARCH_DATASOURCE")
         self.search_skillset = os.getenv("AZURE_SEARCH_SKILLSET")
         self.search_indexer = os.getenv("AZURE_SEARCH_INDEXER")
@@ -34,62 +107,145 @@ class RetrievalManager:
         self.azure_openai_key = os.getenv("AZURE_OPENAI_KEY_FOR_EMBEDDING")
         self.blob_connection_string = os.getenv("AZURE_BLOB_CONNECTION_STRING")
         self.blob_container_name = os.getenv("AZURE_BLOB_CONTAINER")
-        # Search index client initialization for executing Azure Search operations
-        self.search_client = SearchClient(
-            endpoint=self.search_endpoint,
-            index_name=self.search_index,
-            credential=self.search_credential
+        # Search backend: Azure AI Search by default, or the local in-process index
+        self.search_backend = os.getenv("SEARCH_BACKEND", "azure")
+        local_index_path = os.getenv("LOCAL_INDEX_PATH", str(Path(__file__).parent.parent / '.cache' / 'local_index'))
+        # Ingestion bumps the generation of the index it writes to (see ingestion.ingestion_manager)
+        self.generation_name = (
+            os.path.basename(os.path.normpath(local_index_path)) if self.search_backend == "local" else self.search_index
         )
+        self.generation_names = [self.generation_name] if self.generation_name else []
+        if search_clients:
+            self.search_clients = dict(search_clients)
+        elif search_client is None and self.search_backend != "local" and len(self.search_indexes) > 1:
+            from azure.search.documents import SearchClient
+            client_kwargs = {"transport": transport} if transport is not None else {}
+            self.search_clients = {
+                name: SearchClient(endpoint=self.search_endpoint, index_name=name, credential=self.search_credential,
+                                   **client_kwargs)
+                for name in self.search_indexes
+            }
+        else:
+            self.search_clients = {}
+
+        if self.search_clients:
+            self.search_client = next(iter(self.search_clients.values()))
+            # Re-ingesting any of the indexes invalidates results and answers built from them
+            self.generation_names = list(self.search_clients)
+        elif search_client is not None:
+            self.search_client = search_client
+        elif self.search_backend == "local":
+            from retrieval.local_search_backend import LocalSearchBackend, vector_index_options
+            self.search_client = LocalSearchBackend(
+                local_index_path,
+                text_weight=float(os.getenv("LOCAL_HYBRID_TEXT_WEIGHT", "1.0")),
+                vector_weight=float(os.getenv("LOCAL_HYBRID_VECTOR_WEIGHT", "1.0")),
+                rrf_k=int(os.getenv("LOCAL_RRF_K", "60")),
+                **vector_index_options()
+            )
+        else:
+            # Search index client initialization for executing Azure Search operations
+            from azure.search.documents import SearchClient
+            client_kwargs = {"transport": transport} if transport is not None else {}
+            self.search_client = SearchClient(
+                endpoint=self.search_endpoint,
+                index_name=self.search_index,
+                credential=self.search_credential,
+                **client_kwargs
+            )
+
+        if embedder is None:
+            from utility.embedder import Embedder
+            embedder = Embedder()
+        self.embedder = embedder
+
+        # A shard that has not answered within the timeout is left out of the results
+        self.shard_timeout = float(os.getenv("SEARCH_SHARD_TIMEOUT_SECONDS", "2.0"))
+        self._shard_executor = None
+        if len(self.search_clients) > 1:
+            # Threads outlive a timed-out shard request, so leave room for stragglers
+            self._shard_executor = ThreadPoolExecutor(max_workers=4 * len(self.search_clients),
+                                                      thread_name_prefix="search-shard")
+
+        # Repeated queries skip both the embedding call and the search round trip
+        max_entries = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024"))
+        if result_cache is None and max_entries > 0:
+            result_cache = SearchResultCache(
+                max_entries=max_entries,
+                ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300")),
+                generation=generation_of(self.generation_names)
+            )
+        self.result_cache = result_cache
+
+    def with_embedder(self, embedder: "Embedder") -> "RetrievalManager":
+        """
+        A manager that embeds queries with embedder and shares everything else.
+
+        The search clients, shard threads and result cache are this manager's,
+        so no new connections or index copies are made, and this manager keeps
+        its own embedder.
+        """
+        manager = copy.copy(self)
+        manager.embedder = embedder
+        return manager
 
-        self.embedder = Embedder()
     def search_documents(self, query, top_k=5, search_type=SearchType.TEXT):
-        # Perform a search query against the Azure Search index
-        results = None
+        with metrics.timer("rag_retrieval_seconds", search_type=search_type.name.lower()):
+            if self.result_cache is None:
+                return self._search_documents(query, top_k, search_type)[0]
+            return self.result_cache.get_or_search(
+                query, top_k, search_type, lambda: self._search_documents(query, top_k, search_type)
+            )
+
+    def _run_search(self, search_type, search_client=None, **kwargs):
+        # Times the search request and the materialization of its results separately
+        start = time.perf_counter()
+        results = iter((search_client or self.search_client).search(**kwargs))
+        # Azure's pager only sends the request when iteration starts
+        first = next(results, None)
+        metrics.observe("rag_search_request_seconds", time.perf_counter() - start, search_type=search_type.name.lower())
+        start = time.perf_counter()
+        documents = [] if first is None else [format_result(first)] + [format_result(doc) for doc in results]
+        metrics.observe("rag_search_materialize_seconds", time.perf_counter() - start, search_type=search_type.name.lower())
+        return documents
+
+    def _search_documents(self, query, top_k=5, search_type=SearchType.TEXT):
+        # Perform a search query against the Azure Search index, or fan out across several.
+        # Returns the results and whether every index answered, i.e. whether they may be cached
         match search_type:
-            case SearchType.HYBRID:
+            case SearchType.HYBRID | SearchType.VECTOR:
+                # Embedded once, however many indexes are searched
                 query_vector = self.embedder.embed_query(query)
-                results = self.search_client.search(
-                    search_text=query,
-                    vector_queries=[{
-                        "kind": "vector",
-                        "vector": query_vector,
-                        "k": top_k,
-                        "fields": "text_vector"
-                    }],
-                    top=top_k,
-                    select=["title", "chunk","chunk_id","parent_id"]
-                )
-            case SearchType.VECTOR:
-                query_vector = self.embedder.embed_query(query)
-                results = self.search_client.search(
-                    search_text=None,
-                    vector_queries=[{
-                        "kind": "vector",
-                        "vector": query_vector,
-                        "k": top_k,
-                        "fields": "text_vector"
-                    }],
-                    top=top_k,
-                    select=["title", "chunk","chunk_id","parent_id"]
-                )
+                search_kwargs = build_search_kwargs(query if search_type == SearchType.HYBRID else None,
+                                                    query_vector, top_k)
             case SearchType.TEXT:
-                results = self.search_client.search(
-                    search_text=query,
-                    top=top_k,
-                    select=["title", "chunk","chunk_id","parent_id"]
-                )
-
-        return [
-                {
-                    "title": doc.get("title", ""),
-                    "chunk": doc.get("chunk", ""),
-                    "chunk_id": doc.get("chunk_id", 0),
-                    "parent_id": doc.get("parent_id", 0),
-                    "score": doc.get("@search.score", 0.0)
-                }
-                for doc in results
-        ]
-    
+                search_kwargs = build_search_kwargs(query, None, top_k)
+
+        if len(self.search_clients) > 1:
+            results, degraded = self._fan_out(search_type, top_k, search_kwargs)
+            return results, not degraded
+        return self._run_search(search_type, **search_kwargs), True
+
+    def _fan_out(self, search_type, top_k, search_kwargs):
+        # Search every index concurrently and merge the results (see merge_shard_outcomes)
+        futures = {
+            name: self._shard_executor.submit(self._search_shard, search_type, name, client, search_kwargs)
+            for name, client in self.search_clients.items()
+        }
+        done, _ = wait(futures.values(), timeout=self.shard_timeout)
+        outcomes = {}
+        for name, future in futures.items():
+            if future not in done:
+                future.cancel()
+                outcomes[name] = TimeoutError(f"timed out after {self.shard_timeout}s")
+            else:
+                outcomes[name] = future.exception() or future.result()
+        return merge_shard_outcomes(outcomes, top_k, search_type)
+
+    def _search_shard(self, search_type, name, search_client, search_kwargs):
+        with metrics.timer("rag_shard_search_seconds", index=name, search_type=search_type.name.lower()):
+            return self._run_search(search_type, search_client, **search_kwargs)
+
     def search_documents_with_vectors(self, query_text, query_vector, top_k=5):
         # Perform a vector search query against the Azure Search index
         results = self.search_client.search(
@@ -98,13 +254,4 @@ class RetrievalManager:
             select=["title", "chunk","chunk_id","parent_id"]
         )
 
-        return [
-                {
-                    "title": doc.get("title", ""),
-                    "chunk": doc.get("chunk", ""),
-                    "chunk_id": doc.get("chunk_id", 0),
-                    "parent_id": doc.get("parent_id", 0),
-                    "score": doc.get("@search.score", 0.0)
-                }
-                for doc in results
-        ]
\ No newline at end of file
+        return [format_result(doc) for doc in results]
\ No newline at end of file
@@ -1,13 +1,43 @@
 import os
 import sys
+import asyncio
+import argparse
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from retrieval.retrieval_manager import RetrievalManager, SearchType
+from retrieval.async_retrieval_manager import AsyncRetrievalManager
 
 
+async def search_async(query: str):
+    async with AsyncRetrievalManager() as retrieval_manager:
+        return await retrieval_manager.search_documents(query, top_k=5, search_type=SearchType.HYBRID)
+
 def main():
+    parser = argparse.ArgumentParser(description="Search Test")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        default=False,
+        help="Use the asyncio retrieval manager"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Run the query this many times and print the result cache stats"
+    )
+    args = parser.parse_args()
+
     print("Searching for documents related to 'Reimbursement Program':")
-    searchResults = RetrievalManager().search_documents("Reimbursement Program", top_k=5, search_type=SearchType.HYBRID)
+    if args.use_async:
+        searchResults = asyncio.run(search_async("Reimbursement Program"))
+    else:
+        retrieval_manager = RetrievalManager()
+        for _ in range(args.repeat):
+            searchResults = retrieval_manager.search_documents("Reimbursement Program", top_k=5, search_type=SearchType.HYBRID)
+        if retrieval_manager.result_cache is not None:
+            print(f"Result cache: {retrieval_manager.result_cache.stats()}")
     print("Search Completed. Results:")
     # Print out the search results. Results are formatted in azure core ItemPaged
     if len(searchResults) > 0:
@@ -17,4 +47,4 @@ def main():
         print("No results found.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,104 @@
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from retrieval.local_vector_index import LocalVectorIndex
+
+
+def make_vectors(count: int, dimension: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    # Clustered unit vectors, closer to real embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.8 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_index(path: str, vectors: np.ndarray):
+    index = LocalVectorIndex(path, dimension=vectors.shape[1])
+    documents = ({"chunk_id": f"c{i}", "parent_id": "p", "title": "t", "chunk": "", "text_vector": vector}
+                 for i, vector in enumerate(vectors))
+    index.upload_documents(documents)
+    index.save()
+
+
+def evaluate(index: LocalVectorIndex, queries: np.ndarray, truth: list, k: int) -> dict:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        rows = [row for row, _ in index.search_vector(query, k)]
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(set(rows) & expected) / k)
+    latencies.sort()
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and latency of compact vector codes with exact rescoring")
+    parser.add_argument("--index", type=str, default=None, help="Existing local index directory (default: synthetic vectors)")
+    parser.add_argument("--count", type=int, default=50000, help="Synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=1024, help="Synthetic vector length")
+    parser.add_argument("--queries", type=int, default=100, help="Queries, perturbed copies of stored vectors")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--codecs", type=str, default="binary,int8,float16,int8:256,binary:512",
+                        help="Comma-separated codec[:code_dimension] configurations")
+    parser.add_argument("--rescore", type=str, default="default,4,10",
+                        help="Comma-separated rescore factors; 'default' is the codec's own")
+    parser.add_argument("--min-speedup", type=float, default=None,
+                        help="p50 speedup over the exact scan each codec needs at its default settings; timing "
+                             "depends on the machine and corpus size, so it is only checked when given")
+    parser.add_argument("--min-recall", type=float, default=0.95,
+                        help="Recall each codec needs at its default settings")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = args.index
+        if path is None:
+            path = temp_dir
+            build_index(path, make_vectors(args.count, args.dimension))
+        exact = LocalVectorIndex(path)
+        stored = np.asarray(exact._vectors, dtype=np.float32)
+        rng = np.random.default_rng(1)
+        sample = stored[rng.choice(len(stored), size=min(args.queries, len(stored)), replace=False)]
+        queries = sample + 0.05 * rng.standard_normal(sample.shape).astype(np.float32)
+        truth = [{row for row, _ in exact.search_vector(query, args.k)} for query in queries]
+
+        baseline = evaluate(exact, queries, truth, args.k)
+        vector_bytes = exact.footprint()["vectors"]
+        print(f"{len(stored)} vectors of {stored.shape[1]} dimensions, recall@{args.k} against the exact float32 scan")
+        print(f"{'codec':<14}{'rescore':>8}{'scanned MB':>12}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}")
+        print(f"{'exact':<14}{'-':>8}{vector_bytes / 2**20:>12.1f}{baseline['recall']:>8.3f}"
+              f"{baseline['p50_ms']:>9.2f}{baseline['p95_ms']:>9.2f}")
+        # Exact results of the same index are ground truth, any shortfall is the codes' error
+        if args.index is not None and baseline["recall"] < 1.0:
+            print("Warning: the exact scan disagrees with itself; check for pending deletions")
+
+        failures = []
+        for configuration in args.codecs.split(","):
+            codec, _, code_dimension = configuration.partition(":")
+            for factor in args.rescore.split(","):
+                index = LocalVectorIndex(path, codec=codec, code_dimension=int(code_dimension) if code_dimension else None,
+                                         rescore_factor=None if factor == "default" else int(factor))
+                result = evaluate(index, queries, truth, args.k)
+                print(f"{configuration:<14}{index.rescore_factor:>8}{index.footprint()['codes'] / 2**20:>12.1f}"
+                      f"{result['recall']:>8.3f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}")
+                # A codec's defaults are what LOCAL_INDEX_CODEC alone gets, they have to keep recall
+                if not code_dimension and factor == "default":
+                    speedup = baseline["p50_ms"] / result["p50_ms"]
+                    if result["recall"] < args.min_recall:
+                        failures.append(f"{codec}: recall {result['recall']:.3f} < {args.min_recall}")
+                    if args.min_speedup is not None and speedup < args.min_speedup:
+                        failures.append(f"{codec}: {speedup:.2f}x faster than exact < {args.min_speedup}x")
+        assert not failures, "Codecs at their defaults missed the targets: " + "; ".join(failures)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+# Set bits of every byte value, for Hamming distances on numpy versions without bitwise_count
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+class VectorCodec:
+    """
+    Compact codes for unit-length vectors, scored in the first phase of a two-phase search.
+
+    Codes keep the first `dimension` components, renormalized. text-embedding-3
+    models are trained so that prefixes of an embedding are embeddings too,
+    which is what the service's reduced `dimensions` parameter returns.
+    scores() only has to rank rows roughly; the shortlist is rescored with the
+    full vectors.
+    """
+
+    name = "float32"
+    code_dtype = np.dtype(np.float32)
+    # Defaults that keep recall close to the exact float32 scan while scanning
+    # fewer bytes (measured with vector_codec_test.py on 50k x 1024)
+    code_dimension_ratio = 1.0
+    default_rescore_factor = 10
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    @classmethod
+    def default_code_dimension(cls, dimension: int) -> int:
+        return max(1, int(dimension * cls.code_dimension_ratio))
+
+    @property
+    def code_size(self) -> int:
+        # Code elements per vector
+        return self.dimension
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.code_size * self.code_dtype.itemsize
+
+    def fit(self, sample: np.ndarray):
+        """Learn codec parameters from a sample of stored vectors."""
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return self._truncate(vectors).astype(self.code_dtype)
+
+    def prepare_query(self, query: np.ndarray) -> np.ndarray:
+        return self._truncate(query)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of each code to a query from prepare_query."""
+        return np.asarray(codes, dtype=np.float32) @ query
+
+    def _truncate(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors[..., :self.dimension], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def state(self) -> Dict:
+        return {"codec": self.name, "dimension": self.dimension}
+
+    def load_state(self, state: Dict):
+        pass
+
+
+class Float16Codec(VectorCodec):
+    """
+    Half-precision codes, widened to float32 block by block during the scan.
+
+    The codes stay memory-mapped, so processes share their pages. numpy
+    converts float16 several times slower than BLAS multiplies float32, so
+    the scan is slower than the exact float32 scan even at half the
+    dimension; the codec trades latency for a quarter of the scanned bytes.
+    """
+
+    name = "float16"
+    code_dtype = np.dtype(np.float16)
+    code_dimension_ratio = 0.5
+    default_rescore_factor = 20
+
+
+class Int8Codec(VectorCodec):
+    """
+    Scalar quantization to 256 levels per dimension between the sampled minimum and maximum.
+
+    Queries stay in float32 (asymmetric distance), so the only error is the
+    rounding of the stored vectors. Codes are widened to float32 block by block
+    during the scan, which costs about as much as the exact scan at full
+    dimension, so they keep half the components by default.
+    """
+
+    name = "int8"
+    code_dtype = np.dtype(np.uint8)
+    code_dimension_ratio = 0.5
+    default_rescore_factor = 20
+
+    def __init__(self, dimension: int):
+        super().__init__(dimension)
+        self.offsets = np.full(dimension, -1.0, dtype=np.float32)
+        self.scales = np.full(dimension, 2.0 / 255, dtype=np.float32)
+
+    def fit(self, sample: np.ndarray):
+        sample = self._truncate(sample)
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        self.offsets = low.astype(np.float32)
+        self.scales = np.maximum((high - low) / 255, 1e-12).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        levels = np.rint((self._truncate(vectors) - self.offsets) / self.scales)
+        return np.clip(levels, 0, 255).astype(np.uint8)
+
+    def prepare_query(self, query: np.ndarray) -> np.ndarray:
+        query = self._truncate(query)
+        # Dot product with the dequantized code: codes . (query * scales) + offsets . query
+        return np.concatenate([query * self.scales, [np.dot(self.offsets, query)]]).astype(np.float32)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32) @ query[:-1] + query[-1]
+
+    def state(self) -> Dict:
+        return {**super().state(), "offsets": self.offsets.tolist(), "scales": self.scales.tolist()}
+
+    def load_state(self, state: Dict):
+        self.offsets = np.asarray(state["offsets"], dtype=np.float32)
+        self.scales = np.asarray(state["scales"], dtype=np.float32)
+
+
+class BinaryCodec(VectorCodec):
+    """
+    One sign bit per dimension, scored by Hamming distance (32x smaller than float32).
+
+    The fastest scan by far. Its ranking is coarse, so a wide shortlist is
+    rescored; reading a few hundred full rows costs far less than the scan saves.
+    """
+
+    name = "binary"
+    code_dtype = np.dtype(np.uint8)
+    default_rescore_factor = 40
+
+    @property
+    def code_size(self) -> int:
+        return (self.dimension + 7) // 8
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(self._truncate(vectors) > 0, axis=-1)
+
+    def prepare_query(self, query: np.ndarray) -> np.ndarray:
+        return self.encode(query)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        differing = np.bitwise_xor(np.asarray(codes), query)
+        if hasattr(np, "bitwise_count"):
+            distance = np.bitwise_count(differing).sum(axis=-1, dtype=np.int32)
+        else:
+            distance = _POPCOUNT[differing].sum(axis=-1, dtype=np.int32)
+        # Fraction of agreeing signs, rescaled to [-1, 1] like a cosine
+        return (1.0 - 2.0 * distance / self.dimension).astype(np.float32)
+
+
+CODECS = {codec.name: codec for codec in (VectorCodec, Float16Codec, Int8Codec, BinaryCodec)}
+
+
+def make_codec(name: str, dimension: int, state: Optional[Dict] = None) -> VectorCodec:
+    """
+    Create a codec by name.
+
+    Args:
+        name: "float32", "float16", "int8" or "binary"
+        dimension: Leading vector components kept in the codes
+        state: Parameters saved from a fitted codec's state()
+
+    Raises:
+        ValueError: If the codec name is unknown
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown vector codec '{name}', expected one of {', '.join(CODECS)}")
+    codec = CODECS[name](dimension)
+    if state is not None:
+        codec.load_state(state)
+    return codec
@@ -0,0 +1,176 @@
+import os
+import pathlib
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AzureOpenAI
+    from azure.core.pipeline.transport import RequestsTransport
+
+# Process-wide components shared by every chat session. Streamlit re-runs app.py
+# on every interaction but keeps imported modules alive, so anything stored here
+# is built once per process and reused across turns and sessions. Factories
+# import their dependencies, so a process only loads the clients it builds.
+_components: Dict[str, Any] = {}
+_lock = threading.RLock()
+_env_loaded = False
+
+
+def load_env():
+    """Load src/.env once per process; variables already set in the environment take precedence."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv(dotenv_path=pathlib.Path(__file__).parent.parent / '.env')
+            _env_loaded = True
+
+
+def _get_or_create(name: str, factory: Callable[[], Any]) -> Any:
+    component = _components.get(name)
+    if component is None:
+        with _lock:
+            component = _components.get(name)
+            if component is None:
+                # Factories read their settings from the environment
+                load_env()
+                component = factory()
+                _components[name] = component
+    return component
+
+
+def get_http_client() -> "httpx.Client":
+    """Pooled keep-alive HTTP client shared by all Azure OpenAI clients."""
+    def factory():
+        import httpx
+        from openai import DefaultHttpxClient
+        # httpx closes idle connections after 5s by default, far shorter than the
+        # gap between chat turns, so keep them around long enough to be reused
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))
+        )
+        return DefaultHttpxClient(limits=limits)
+    return _get_or_create("http_client", factory)
+
+
+def get_search_transport() -> "RequestsTransport":
+    """Pooled keep-alive transport shared by all Azure AI Search clients."""
+    def factory():
+        import requests
+        from azure.core.pipeline.transport import RequestsTransport
+        pool_size = int(os.getenv("SEARCH_MAX_CONNECTIONS", "20"))
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return RequestsTransport(session=session, session_owner=False)
+    return _get_or_create("search_transport", factory)
+
+
+def get_scheduler(deployment: str):
+    """
+    Rate-limit scheduler for an Azure OpenAI deployment, shared by every caller in the process.
+
+    deployment is "embedding" or "chat"; quotas come from AZURE_OPENAI_<DEPLOYMENT>_RPM/_TPM.
+    Without quotas the scheduler still orders requests by priority and honours retry-after.
+    """
+    def factory():
+        from utility.request_scheduler import RequestScheduler
+        prefix = f"AZURE_OPENAI_{deployment.upper()}"
+        return RequestScheduler(
+            deployment,
+            requests_per_minute=float(os.getenv(f"{prefix}_RPM", "0")) or None,
+            tokens_per_minute=float(os.getenv(f"{prefix}_TPM", "0")) or None,
+            bulk_reserve=float(os.getenv("SCHEDULER_BULK_RESERVE", "0.2"))
+        )
+    return _get_or_create(f"scheduler:{deployment}", factory)
+
+
+def get_embedder():
+    from utility.embedder import Embedder
+    return _get_or_create("embedder", lambda: Embedder(http_client=get_http_client()))
+
+
+def get_retrieval_manager():
+    from retrieval.retrieval_manager import RetrievalManager
+    return _get_or_create(
+        "retrieval_manager",
+        lambda: RetrievalManager(embedder=get_embedder(), transport=get_search_transport())
+    )
+
+
+def get_rag_prompt():
+    """The RAG chat prompt template, parsed once per process and reloaded when the file changes."""
+    from generation.prompt_template import PromptTemplate
+    from generation.rag_chat import PROMPT_PATH
+    return _get_or_create("rag_prompt", lambda: PromptTemplate(PROMPT_PATH))
+
+
+def get_answer_cache(generation_names: List[str] = None):
+    """
+    Semantic answer cache shared by all chat sessions, or None when disabled.
+
+    One cache per set of indexes searched together (a RetrievalManager's
+    generation_names); it is cleared when the generation of any of them changes.
+    """
+    max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+    if max_entries <= 0:
+        return None
+
+    def factory():
+        from generation.answer_cache import SemanticAnswerCache
+        from utility.index_generation import generation_of
+        return SemanticAnswerCache(
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+            max_entries=max_entries,
+            generation=generation_of(generation_names)
+        )
+    return _get_or_create(f"answer_cache:{','.join(generation_names or [])}", factory)
+
+
+def get_retrieval_policy():
+    """
+    Retrieval policy shared by all chat sessions.
+
+    Loaded from the JSON file at RETRIEVAL_POLICY_PATH (written by
+    calibrate_retrieval_policy.py); without one, a plain top-3 hybrid search.
+    """
+    def factory():
+        from generation.retrieval_policy import AdaptiveRetrievalPolicy
+        path = os.getenv("RETRIEVAL_POLICY_PATH")
+        if path and os.path.exists(path):
+            return AdaptiveRetrievalPolicy.load(path)
+        return AdaptiveRetrievalPolicy()
+    return _get_or_create("retrieval_policy", factory)
+
+
+def get_chat_client() -> "AzureOpenAI":
+    """Azure OpenAI chat client configured from the RAG prompty's model configuration."""
+    def factory():
+        from openai import AzureOpenAI
+        configuration = {
+            key: value
+            for key, value in get_rag_prompt().prompt.model.configuration.items()
+            if key not in ("type", "azure_deployment")
+        }
+        # Same credential fallback as prompty's Azure executor when no key is configured
+        if "api_key" not in configuration and not os.getenv("AZURE_OPENAI_API_KEY"):
+            import azure.identity
+            credential = azure.identity.DefaultAzureCredential(exclude_shared_token_cache_credential=True)
+            configuration["azure_ad_token_provider"] = azure.identity.get_bearer_token_provider(
+                credential, "https://cognitiveservices.azure.com/.default"
+            )
+        # RAGChat retries through the shared scheduler, so throttling pauses every caller
+        return AzureOpenAI(http_client=get_http_client(), max_retries=0, **configuration)
+    return _get_or_create("chat_client", factory)
+
+
+def reset():
+    """Drop all shared components, e.g. after configuration changes or in tests."""
+    with _lock:
+        _components.clear()
@@ -1,59 +1,305 @@
-from typing import List
+from typing import List, Optional
+import httpx
 import os
 import time
+import random
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI, APIConnectionError, APIStatusError
+
+from utility.embedding_cache import EmbeddingCache
+from utility.tokens import count_tokens, EMBEDDING_ENCODING
+from utility import metrics
+from utility.request_scheduler import Priority, RequestScheduler, RETRYABLE_STATUS_CODES, retry_after_seconds
 
 class Embedder:
-    def __init__(self):
-        """Initialize embedder with Azure OpenAI."""
+    def __init__(self, endpoint: Optional[str] = None, api_key: Optional[str] = None,
+                 cache: Optional[EmbeddingCache] = None, http_client: Optional[httpx.Client] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        """Initialize embedder with Azure OpenAI and an optional on-disk embedding cache."""
         # Load environment variables from .env file
         dotenv_path = Path(__file__).parent.parent / '.env'
         load_dotenv(dotenv_path)
-        self.azure_openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT_FOR_EMBEDDING")
-        self.azure_openai_key = os.getenv("AZURE_OPENAI_KEY_FOR_EMBEDDING")
+        self.azure_openai_endpoint = endpoint or os.getenv("AZURE_OPENAI_ENDPOINT_FOR_EMBEDDING")
+        self.azure_openai_key = api_key or os.getenv("AZURE_OPENAI_KEY_FOR_EMBEDDING")
+        # Retries are handled by _create_embeddings so backoff is applied consistently
         self.client = AzureOpenAI(
             api_key=self.azure_openai_key,
             api_version="2024-10-21",
-            azure_endpoint=self.azure_openai_endpoint
+            azure_endpoint=self.azure_openai_endpoint,
+            max_retries=0,
+            http_client=http_client
         )
-        
+        # One async client per event loop: its connection pool belongs to the loop that created it,
+        # and each asyncio.run() (e.g. per CLI call or Streamlit rerun) starts a new loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncAzureOpenAI]" = \
+            weakref.WeakKeyDictionary()
+        self._async_clients_lock = threading.Lock()
+
         self.deployment_name = "text-embedding-3-large"
-        self.dimension = 1024  # Assuming the embedding dimension for "text-embedding-3-large"
+        # text-embedding-3 models return shorter vectors on request; the index must use the same length
+        self.dimension = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
         self.batch_size = 16  # Default batch size
-        
+        self.max_batch_tokens = 8000  # Upper bound on estimated tokens per request
+        self.max_concurrency = 4  # Batches in flight at once
+        self.max_retries = 5
+        self.backoff_base = 0.5  # Seconds, doubled on each retry
+        self.backoff_max = 30.0
+
+        # Persistent embedding cache, disabled by setting EMBEDDING_CACHE_PATH to an empty value
+        if cache is None:
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH", str(Path(__file__).parent.parent / '.cache' / 'embeddings.sqlite'))
+            if cache_path:
+                cache = EmbeddingCache(cache_path, max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "100000")))
+        self.cache = cache
+
+        # Requests wait for quota in the process-wide scheduler; queries go ahead of bulk embedding
+        if scheduler is None:
+            from utility import component_registry
+            scheduler = component_registry.get_scheduler("embedding")
+        self.scheduler = scheduler
+
     def embed_text(self, text: str) -> List[float]:
         """
         Generate embedding for a single text.
-        
+
         Args:
             text: Text to embed
-        
+
         Returns:
             Embedding vector
         """
-        try:
-            response = self.client.embeddings.create(
-                input=text,
-                model=self.deployment_name,
-                dimensions=self.dimension
-            )
-            
-            return response.data[0].embedding
-        
-        except Exception as e:
-            raise
+        start = time.perf_counter()
+        if self.cache is None:
+            embedding = self._create_embeddings([text])[0]
+            metrics.observe("rag_embedding_seconds", time.perf_counter() - start, source="service")
+            return embedding
+
+        key = EmbeddingCache.make_key(self.deployment_name, self.dimension, text)
+        embedding = self.cache.get(key)
+        source = "cache"
+        if embedding is None:
+            embedding = self._create_embeddings([text])[0]
+            self.cache.put(key, embedding)
+            source = "service"
+        metrics.observe("rag_embedding_seconds", time.perf_counter() - start, source=source)
+        return embedding
 
     def embed_query(self, query: str) -> List[float]:
         """
         Generate embedding for a search query.
-        
+
         Args:
             query: Query text
-        
+
         Returns:
             Query embedding vector
         """
-        return self.embed_text(query)
\ No newline at end of file
+        return self.embed_text(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """
+        Generate embedding for a search query without blocking the event loop.
+
+        Args:
+            query: Query text
+
+        Returns:
+            Query embedding vector
+        """
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = EmbeddingCache.make_key(self.deployment_name, self.dimension, query)
+            # The SQLite cache blocks on disk and on other writers, so it is read and written in a worker thread
+            embedding = await asyncio.to_thread(self.cache.get, key)
+            if embedding is not None:
+                metrics.observe("rag_embedding_seconds", time.perf_counter() - start, source="cache")
+                return embedding
+
+        embedding = (await self._acreate_embeddings([query]))[0]
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, embedding)
+        metrics.observe("rag_embedding_seconds", time.perf_counter() - start, source="service")
+        return embedding
+
+    async def aclose(self):
+        """Close the async client of the running event loop, if it has one."""
+        with self._async_clients_lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _async_client(self) -> AsyncAzureOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._async_clients_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncAzureOpenAI(
+                    api_key=self.azure_openai_key,
+                    api_version="2024-10-21",
+                    azure_endpoint=self.azure_openai_endpoint,
+                    max_retries=0
+                )
+                self._async_clients[loop] = client
+        return client
+
+    def embed_texts(self, texts: List[str], priority: Priority = Priority.BULK) -> List[List[float]]:
+        """
+        Generate embeddings for many texts using batched, concurrent requests.
+
+        Texts are packed into batches bounded by batch_size and max_batch_tokens,
+        and up to max_concurrency batches are sent at once.
+
+        Args:
+            texts: Texts to embed
+            priority: Scheduling priority; BULK yields to interactive queries
+
+        Returns:
+            Embedding vectors, in the same order as texts
+        """
+        start = time.perf_counter()
+        embeddings: List[List[float]] = [None] * len(texts)
+        keys = []
+        if self.cache is not None:
+            keys = [EmbeddingCache.make_key(self.deployment_name, self.dimension, text) for text in texts]
+            cached = self.cache.get_many(keys)
+            for i, key in enumerate(keys):
+                embeddings[i] = cached.get(key)
+
+        # Only texts missing from the cache go to the service
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        missing_texts = [texts[i] for i in missing]
+        batches = self._make_batches(missing_texts)
+        if len(batches) <= 1 or self.max_concurrency <= 1:
+            results = [self._create_embeddings([missing_texts[i] for i in batch], priority) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+                results = list(executor.map(
+                    lambda batch: self._create_embeddings([missing_texts[i] for i in batch], priority),
+                    batches
+                ))
+
+        new_entries = {}
+        for batch, vectors in zip(batches, results):
+            for i, vector in zip(batch, vectors):
+                embeddings[missing[i]] = vector
+                if keys:
+                    new_entries[keys[missing[i]]] = vector
+        if self.cache is not None:
+            self.cache.put_many(new_entries)
+        metrics.observe("rag_embedding_batch_seconds", time.perf_counter() - start, priority=priority.name.lower())
+        return embeddings
+
+    # Alias kept for callers that prefer the "many" naming
+    embed_many = embed_texts
+
+    def _make_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group text indices into batches bounded by count and estimated tokens.
+
+        Args:
+            texts: Texts to batch
+
+        Returns:
+            List of batches, each a list of indices into texts
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for i, text in enumerate(texts):
+            tokens = self._estimate_tokens(text)
+            if current and (len(current) >= self.batch_size or current_tokens + tokens > self.max_batch_tokens):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Exact with tiktoken installed, otherwise roughly 4 characters per token
+        return count_tokens(text, EMBEDDING_ENCODING)
+
+    def _create_embeddings(self, inputs: List[str], priority: Priority = Priority.INTERACTIVE) -> List[List[float]]:
+        """
+        Call the embeddings endpoint, retrying throttled and transient failures.
+
+        Args:
+            inputs: Texts to embed in a single request
+            priority: Scheduling priority of the request
+
+        Returns:
+            Embedding vectors, in the same order as inputs
+        """
+        tokens = sum(self._estimate_tokens(text) for text in inputs)
+        attempt = 0
+        while True:
+            self.scheduler.acquire(tokens, priority)
+            try:
+                response = self.client.embeddings.create(
+                    input=inputs,
+                    model=self.deployment_name,
+                    dimensions=self.dimension
+                )
+                self.scheduler.release(tokens, response.usage.total_tokens if response.usage else None)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+            except (APIConnectionError, APIStatusError) as e:
+                retryable = isinstance(e, APIConnectionError) or e.status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                print(f"Embedding request failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+                self._wait_before_retry(e, delay)
+                attempt += 1
+
+    def _wait_before_retry(self, error: Exception, delay: float):
+        # A 429 means the whole deployment is over quota: pause every caller, not just this one
+        if isinstance(error, APIStatusError) and error.status_code == 429:
+            self.scheduler.penalize(delay)
+        else:
+            time.sleep(delay)
+
+    async def _acreate_embeddings(self, inputs: List[str]) -> List[List[float]]:
+        # Async counterpart of _create_embeddings with the same retry policy
+        client = self._async_client()
+        tokens = sum(self._estimate_tokens(text) for text in inputs)
+        attempt = 0
+        while True:
+            await self.scheduler.aacquire(tokens, Priority.INTERACTIVE)
+            try:
+                response = await client.embeddings.create(
+                    input=inputs,
+                    model=self.deployment_name,
+                    dimensions=self.dimension
+                )
+                self.scheduler.release(tokens, response.usage.total_tokens if response.usage else None)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+            except (APIConnectionError, APIStatusError) as e:
+                retryable = isinstance(e, APIConnectionError) or e.status_code in RETRYABLE_STATUS_CODES
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                print(f"Embedding request failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+                if isinstance(e, APIStatusError) and e.status_code == 429:
+                    # The next aacquire waits out the pause
+                    self.scheduler.penalize(delay)
+                else:
+                    await asyncio.sleep(delay)
+                attempt += 1
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        # Prefer the service's retry-after hint, fall back to exponential backoff with jitter
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * (0.5 + random.random() / 2)
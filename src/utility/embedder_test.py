@@ -1,16 +1,66 @@
 import os
 import sys
+import asyncio
+import argparse
+import tempfile
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
+sys.path.append(str(Path(__file__).parent.parent))
 
 from src.utility.embedder import Embedder
+from src.utility.embedding_cache import EmbeddingCache
+from src.utility.fake_openai import FakeOpenAIServer, fake_embedding
+
+def run_batch_test(embedder: Embedder):
+    texts = [f"Sample text number {i} for batch embedding." for i in range(50)]
+    embeddings = embedder.embed_texts(texts)
+    assert len(embeddings) == len(texts), "Expected one embedding per input"
+    print(f"Embedded {len(texts)} texts in batches of up to {embedder.batch_size}")
+    return texts, embeddings
 
 def main():
+    parser = argparse.ArgumentParser(description="Embedder Test")
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        default=False,
+        help="Run against a local fake embeddings endpoint instead of Azure OpenAI"
+    )
+    args = parser.parse_args()
+
     print("Running embedder tests...")
+    if args.fake:
+        # Use a throwaway cache so fake vectors never land in the real embedding cache
+        with FakeOpenAIServer() as server, tempfile.TemporaryDirectory() as cache_dir:
+            cache = EmbeddingCache(os.path.join(cache_dir, "embeddings.sqlite"))
+            embedder = Embedder(endpoint=server.endpoint, api_key="fake-key", cache=cache)
+            texts, embeddings = run_batch_test(embedder)
+            for text, embedding in zip(texts, embeddings):
+                expected = fake_embedding(text, embedder.dimension)
+                assert max(abs(a - b) for a, b in zip(embedding, expected)) < 1e-6, "Embeddings out of input order"
+            print(f"Requests sent: {len(server.requests)}. Order preserved.")
+            requests_before = len(server.requests)
+            run_batch_test(embedder)
+            embedder.embed_query(texts[0])
+            assert len(server.requests) == requests_before, "Expected cached embeddings to skip the service"
+            print(f"Cache stats: {cache.stats()}")
+
+            # Each asyncio.run() is a new event loop, like a CLI call or a Streamlit rerun
+            os.environ["EMBEDDING_CACHE_PATH"] = ""
+            uncached = Embedder(endpoint=server.endpoint, api_key="fake-key")
+            # A client left bound to a closed loop fails to connect; without retries that fails the test
+            uncached.max_retries = 0
+            for query in ("first event loop", "second event loop"):
+                embedding = asyncio.run(uncached.aembed_query(query))
+                assert embedding == fake_embedding(query, uncached.dimension), "Unexpected async embedding"
+            print("Async queries from two event loops succeeded")
+        return
+
     embedder = Embedder()
     sample_text = "This is a sample text for embedding."
     embedding = embedder.embed_text(sample_text)
     print(f"Embedding for sample text: {embedding}")
+    run_batch_test(embedder)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
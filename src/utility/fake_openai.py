@@ -0,0 +1,233 @@
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+def fake_embedding(text: str, dimension: int) -> List[float]:
+    """
+    Deterministic unit-length pseudo embedding for a text.
+
+    Args:
+        text: Text to embed
+        dimension: Vector length
+
+    Returns:
+        Embedding vector
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dimension)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep test output quiet
+        pass
+
+    def setup(self):
+        super().setup()
+        # Once per connection, like a TLS handshake; kept-alive connections skip it
+        time.sleep(self.server.fake.connect_delay)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?", 1)[0]
+        server: FakeOpenAIServer = self.server.fake
+
+        if path.endswith("/embeddings"):
+            inputs = body.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            if self._throttle(server, sum(len(text) // 4 + 1 for text in inputs)):
+                return
+            server.record("embeddings", body)
+            time.sleep(server.embedding_delay)
+            dimension = body.get("dimensions") or server.dimension
+            payload = {
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": fake_embedding(text, dimension)}
+                    for i, text in enumerate(inputs)
+                ],
+                "model": body.get("model", "fake-embedding"),
+                "usage": {
+                    "prompt_tokens": sum(len(text) // 4 + 1 for text in inputs),
+                    "total_tokens": sum(len(text) // 4 + 1 for text in inputs)
+                }
+            }
+            self._send_json(200, payload)
+        elif path.endswith("/chat/completions"):
+            prompt_tokens = sum(len(str(message.get("content", ""))) // 4 + 1 for message in body.get("messages", []))
+            if self._throttle(server, prompt_tokens + (body.get("max_tokens") or 0)):
+                return
+            server.record("chat", body)
+            time.sleep(server.chat_delay)
+            if body.get("stream"):
+                self._send_chat_stream(server, body)
+            else:
+                time.sleep(server.chat_token_delay * len(server.chat_tokens()))
+                content = server.chat_response
+                self._send_json(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake-chat"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content}
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(server.chat_tokens()), "total_tokens": 0}
+                })
+        else:
+            self._send_json(404, {"error": {"code": "NotFound", "message": f"Unknown path {path}"}})
+
+    def _throttle(self, server: "FakeOpenAIServer", tokens: int) -> bool:
+        # Answer 429 with a retry-after-ms hint when the request would exceed the quota
+        retry_after = server.admit(tokens)
+        if retry_after is None:
+            return False
+        self._send_json(
+            429,
+            {"error": {"code": "429", "message": "Requests to this deployment have exceeded the rate limit."}},
+            headers={"retry-after-ms": str(int(retry_after * 1000) + 1), "retry-after": str(math.ceil(retry_after))}
+        )
+        return True
+
+    def _send_chat_stream(self, server: "FakeOpenAIServer", body: dict):
+        # Server-sent events in the chat.completion.chunk format, one token per event
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send_chunk(delta: dict = None, finish_reason=None, usage: dict = None):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake-chat"),
+                "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                "usage": usage
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send_chunk({"role": "assistant", "content": ""})
+        for token in server.chat_tokens():
+            time.sleep(server.chat_token_delay)
+            send_chunk({"content": token})
+        send_chunk({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            # Like the service: a final chunk without choices reporting the usage of the whole response
+            prompt_tokens = sum(len(str(message.get("content", ""))) // 4 + 1 for message in body.get("messages", []))
+            completion_tokens = len(server.chat_tokens())
+            send_chunk(usage={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the Azure OpenAI REST endpoint.
+
+    Serves /openai/deployments/<name>/embeddings with deterministic vectors and
+    /openai/deployments/<name>/chat/completions with a canned answer, streamed
+    token by token when requested, so the Embedder and RAGChat can be exercised
+    without network access or credentials.
+
+    With requests_per_window or tokens_per_window set, it enforces a quota like
+    a deployment's RPM/TPM over fixed windows of quota_window seconds and
+    answers 429 with retry-after headers once a window's quota is used up.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dimension: int = 1024,
+                 chat_response: str = "This is a fake answer based on the provided context.",
+                 chat_token_delay: float = 0.0, embedding_delay: float = 0.0, chat_delay: float = 0.0,
+                 requests_per_window: int = None, tokens_per_window: int = None, quota_window: float = 60.0,
+                 connect_delay: float = 0.0):
+        self.dimension = dimension
+        self.chat_response = chat_response
+        self.chat_token_delay = chat_token_delay  # Seconds between streamed tokens
+        self.embedding_delay = embedding_delay  # Seconds per embeddings request
+        self.chat_delay = chat_delay  # Seconds before a chat response starts, i.e. prompt processing
+        self.connect_delay = connect_delay  # Seconds to set up each new connection
+        self.requests_per_window = requests_per_window
+        self.tokens_per_window = tokens_per_window
+        self.quota_window = quota_window
+        self.throttled = 0
+        self.requests = []
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self._window_tokens = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _FakeOpenAIHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def chat_tokens(self) -> List[str]:
+        # Split on spaces but keep them attached, so joined tokens equal the response
+        words = self.chat_response.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def admit(self, tokens: int):
+        """Count a request against the quota; returns seconds until the window resets if it is over."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.quota_window:
+                self._window_start, self._window_requests, self._window_tokens = now, 0, 0
+            over_requests = self.requests_per_window is not None and self._window_requests + 1 > self.requests_per_window
+            over_tokens = self.tokens_per_window is not None and self._window_tokens + tokens > self.tokens_per_window
+            if over_requests or over_tokens:
+                self.throttled += 1
+                return self._window_start + self.quota_window - now
+            self._window_requests += 1
+            self._window_tokens += tokens
+            return None
+
+    def record(self, kind: str, body: dict):
+        with self._lock:
+            self.requests.append((kind, body))
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
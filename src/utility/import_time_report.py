@@ -0,0 +1,65 @@
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+SRC_DIR = Path(__file__).parent.parent
+DEFAULT_MODULES = ["generation.rag_chat", "retrieval.retrieval_manager", "ingestion.ingest", "utility.embedder"]
+
+
+def import_times(module: str) -> List[Dict]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        One {"module", "self_ms", "cumulative_ms", "depth"} per module the import loaded, in the
+        order they finished; modules the interpreter loads at startup are left out
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    times = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            # Nested imports are indented by two spaces per level
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2
+        })
+    # The module finishes last, right after the modules it imported
+    first = len(times) - 1
+    while first > 0 and times[first - 1]["depth"] > 0:
+        first -= 1
+    return times[first:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how long the app's entry modules take to import")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES,
+                        help=f"Modules to import (default: {' '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--top", type=int, default=10, help="Slowest packages to list per module (default: 10)")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        times = import_times(module)
+        print(f"{module}: {times[-1]['cumulative_ms']:.0f} ms, {len(times)} modules imported")
+        # Self times add up without counting a module twice, whichever package imported it first
+        packages: Dict[str, float] = {}
+        for item in times:
+            package = item["module"].split(".")[0]
+            packages[package] = packages.get(package, 0.0) + item["self_ms"]
+        for package, milliseconds in sorted(packages.items(), key=lambda entry: -entry[1])[:args.top]:
+            print(f"  {milliseconds:8.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+from typing import Iterable, List, Optional, Set, Tuple
+import os
+import json
+from pathlib import Path
+
+DEFAULT_DIRECTORY = Path(__file__).parent.parent / '.cache'
+# Change lists kept per index; a cache further behind than this drops everything
+KEEP_CHANGES = 32
+
+
+class IndexGeneration:
+    """
+    Counter that changes every time an index is rebuilt or re-ingested.
+
+    The value lives in a small file ({index}.generation) so the ingestion CLI
+    and the app, running in different processes, agree on it. Caches store the
+    generation their entries were computed under and drop them once it moves.
+
+    A bump may record the chunk_ids it changed or deleted ({index}.generation.{value}.changes),
+    so caches keyed by chunk_id can drop only the entries built from those chunks.
+    """
+
+    def __init__(self, index_name: str, directory: Optional[str] = None):
+        directory = directory or os.getenv("INDEX_GENERATION_DIR") or str(DEFAULT_DIRECTORY)
+        self.path = os.path.join(directory, f"{index_name}.generation")
+        self._mtime = None
+        self._value = 0
+
+    def current(self) -> int:
+        # A stat per call; the file is only re-read when it has been rewritten
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._value = None, 0
+            return 0
+        if mtime != self._mtime:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._value = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                return self._value
+            self._mtime = mtime
+        return self._value
+
+    def bump(self, changed_chunk_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Advance the generation, invalidating anything cached under the previous one.
+
+        Args:
+            changed_chunk_ids: chunk_ids this change updated or deleted, if known; without them
+                every chunk counts as changed
+        """
+        value = self.current() + 1
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        changes_path = self._changes_path(value)
+        if changed_chunk_ids is not None:
+            # Written before the new value, so a reader that sees the value also finds its changes
+            with open(changes_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(sorted(changed_chunk_ids), f)
+            os.replace(changes_path + ".tmp", changes_path)
+        elif os.path.exists(changes_path):
+            # Left over from a counter that was reset
+            os.remove(changes_path)
+        if value > KEEP_CHANGES and os.path.exists(self._changes_path(value - KEEP_CHANGES)):
+            os.remove(self._changes_path(value - KEEP_CHANGES))
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(str(value))
+        os.replace(temp_path, self.path)
+        return value
+
+    def changes_since(self, value: int) -> Optional[Set[str]]:
+        """
+        chunk_ids changed by the bumps after generation value.
+
+        Returns:
+            The changed chunk_ids, or None if any of those bumps did not record them
+        """
+        current = self.current()
+        if current < value or current - value > KEEP_CHANGES:
+            return None
+        changed = set()
+        for step in range(value + 1, current + 1):
+            try:
+                with open(self._changes_path(step), encoding="utf-8") as f:
+                    changed.update(json.load(f))
+            except (OSError, ValueError):
+                return None
+        return changed
+
+    def _changes_path(self, value: int) -> str:
+        return f"{self.path}.{value}.changes"
+
+
+class CombinedGeneration:
+    """Generation of several indexes, e.g. the shards one RetrievalManager searches; moves when any of them does."""
+
+    def __init__(self, generations: List[IndexGeneration]):
+        self.generations = generations
+
+    def current(self) -> Tuple[int, ...]:
+        return tuple(generation.current() for generation in self.generations)
+
+    def changes_since(self, value: Tuple[int, ...]) -> Optional[Set[str]]:
+        changed = set()
+        for generation, previous in zip(self.generations, value):
+            changes = generation.changes_since(previous)
+            if changes is None:
+                return None
+            changed |= changes
+        return changed
+
+
+def generation_of(index_names: List[str]):
+    """IndexGeneration of one index, CombinedGeneration of several, or None without any."""
+    if not index_names:
+        return None
+    if len(index_names) == 1:
+        return IndexGeneration(index_names[0])
+    return CombinedGeneration([IndexGeneration(name) for name in index_names])
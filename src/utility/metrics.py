@@ -0,0 +1,201 @@
+from typing import Dict, List, Optional, Tuple
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stage timings are only recorded with RAG_METRICS=true; otherwise every call returns immediately
+QUANTILES = (0.5, 0.95, 0.99)
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Latency distribution: exact count and sum, quantiles over the most recent samples."""
+
+    def __init__(self, max_samples: int = 2048):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+class _Timer:
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """
+    In-process latency histograms keyed by metric name and labels.
+
+    Observations can also be appended to a JSON lines file as they happen,
+    and the histograms exported in Prometheus text format.
+    """
+
+    def __init__(self, enabled: bool = True, jsonl_path: Optional[str] = None):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._lock = threading.Lock()
+        self._jsonl = None
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if self.jsonl_path:
+                if self._jsonl is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.jsonl_path)), exist_ok=True)
+                    self._jsonl = open(self.jsonl_path, "a", encoding="utf-8", buffering=1)
+                self._jsonl.write(json.dumps({"ts": time.time(), "metric": name, "seconds": seconds, **labels}) + "\n")
+
+    def timer(self, name: str, **labels):
+        """Context manager that observes the time spent in its block."""
+        if not self.enabled:
+            return _NOOP
+        return _Timer(self, name, labels)
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._histograms.items())
+        rows = []
+        for (name, labels), histogram in sorted(items):
+            quantiles = histogram.quantiles()
+            rows.append({
+                "metric": name,
+                **dict(labels),
+                "count": histogram.count,
+                "sum": histogram.sum,
+                **{f"p{int(q * 100)}": value for q, value in quantiles.items()}
+            })
+        return rows
+
+    def to_prometheus(self) -> str:
+        """All histograms as Prometheus summaries (quantiles, _sum and _count)."""
+        with self._lock:
+            items = list(self._histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), histogram in sorted(items):
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            for q, value in histogram.quantiles().items():
+                quantile_labels = ",".join(filter(None, [label_text, f'quantile="{q}"']))
+                lines.append(f"{name}{{{quantile_labels}}} {value:.6f}")
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{name}_sum{suffix} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_jsonl_snapshot(self, path: str):
+        """Append the current percentiles, one JSON line per histogram."""
+        now = time.time()
+        with open(path, "a", encoding="utf-8") as f:
+            for row in self.snapshot():
+                f.write(json.dumps({"ts": now, **row}) + "\n")
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+_registry: Optional[MetricsRegistry] = None
+_server = None
+_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """The process-wide registry, configured from RAG_METRICS and RAG_METRICS_JSONL on first use."""
+    global _registry
+    if _registry is None:
+        # Created lazily so settings from .env files loaded after import are picked up
+        with _lock:
+            if _registry is None:
+                _registry = MetricsRegistry(
+                    enabled=os.getenv("RAG_METRICS", "false").lower() == "true",
+                    jsonl_path=os.getenv("RAG_METRICS_JSONL") or None
+                )
+    return _registry
+
+
+def enabled() -> bool:
+    return get_registry().enabled
+
+
+def observe(name: str, seconds: float, **labels):
+    get_registry().observe(name, seconds, **labels)
+
+
+def timer(name: str, **labels):
+    return get_registry().timer(name, **labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = get_registry().to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_http_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics in Prometheus text format from a background thread, once per process.
+
+    Args:
+        port: Port to listen on; defaults to RAG_METRICS_PORT, and nothing is started without one
+
+    Returns:
+        The server, or None when metrics are disabled or no port is configured
+    """
+    global _server
+    port = port or int(os.getenv("RAG_METRICS_PORT", "0"))
+    if not get_registry().enabled or not port:
+        return None
+    with _lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
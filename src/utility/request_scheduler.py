@@ -0,0 +1,200 @@
+from typing import Dict, Optional
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from enum import IntEnum
+
+from utility import metrics
+
+# Status codes worth retrying: throttling and transient service errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+# Longest an aacquire sleeps before checking again; async waiters are not woken by the condition
+ASYNC_POLL_SECONDS = 0.05
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The retry-after-ms or retry-after hint of a failed openai request, if the service sent one."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        if response.headers.get("retry-after-ms") is not None:
+            return float(response.headers["retry-after-ms"]) / 1000.0
+        if response.headers.get("retry-after") is not None:
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class Priority(IntEnum):
+    # Lower values are served first
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class TokenBucket:
+    """Bucket refilled continuously at rate_per_minute, holding at most capacity."""
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class RequestScheduler:
+    """
+    Admission control for one Azure OpenAI deployment's TPM and RPM quota.
+
+    Every request takes one unit from the requests bucket and its estimated
+    tokens from the tokens bucket, waiting until both allow it. Buckets hold
+    burst_seconds worth of quota (Azure enforces quotas over short windows as
+    well as per minute). Waiting requests are served by priority, then in
+    arrival order, and BULK requests may not draw the buckets below
+    bulk_reserve of their capacity, so interactive requests always find
+    headroom. A 429's retry-after pauses every request, not just the one that
+    was throttled.
+
+    Quotas are per process; split the deployment quota between processes that
+    share it (e.g. the app and an ingestion job).
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 bulk_reserve: float = 0.2, burst_seconds: float = 10.0):
+        self.name = name
+        self.bulk_reserve = bulk_reserve
+        self._buckets = {}
+        if requests_per_minute:
+            self._buckets["requests"] = TokenBucket(requests_per_minute, max(1.0, requests_per_minute * burst_seconds / 60.0))
+        if tokens_per_minute:
+            self._buckets["tokens"] = TokenBucket(tokens_per_minute, max(1.0, tokens_per_minute * burst_seconds / 60.0))
+        self._condition = threading.Condition()
+        self._waiting = []  # Heap of (priority, arrival number)
+        self._arrivals = itertools.count()
+        self._paused_until = 0.0
+        self.requests = {priority: 0 for priority in Priority}
+        self.wait_seconds = {priority: 0.0 for priority in Priority}
+        self.throttled = 0
+
+    def acquire(self, tokens: int = 0, priority: Priority = Priority.INTERACTIVE) -> float:
+        """
+        Block until a request may be sent.
+
+        Args:
+            tokens: Estimated tokens the request will consume
+            priority: INTERACTIVE for user-facing calls, BULK for ingestion and evaluation
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        amounts = {"requests": 1, "tokens": tokens}
+        with self._condition:
+            entry = (int(priority), next(self._arrivals))
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._paused_until - now
+                    if delay <= 0 and self._waiting[0] == entry:
+                        delay = self._admission_delay(amounts, priority, now)
+                        if delay <= 0:
+                            break
+                    # Woken early when the head of the queue changes or a quota is refunded
+                    self._condition.wait(delay if delay > 0 else None)
+            finally:
+                self._leave(entry)
+        return self._record(priority, start)
+
+    async def aacquire(self, tokens: int = 0, priority: Priority = Priority.INTERACTIVE) -> float:
+        """
+        Wait without blocking the event loop until a request may be sent.
+
+        Takes the same place in the queue as acquire. The lock is only held
+        for the bookkeeping, never while waiting, and an admitted request
+        returns without leaving the event loop.
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        amounts = {"requests": 1, "tokens": tokens}
+        entry = (int(priority), next(self._arrivals))
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+        try:
+            while True:
+                with self._condition:
+                    now = time.monotonic()
+                    delay = self._paused_until - now
+                    if delay <= 0 and self._waiting[0] == entry:
+                        delay = self._admission_delay(amounts, priority, now)
+                        if delay <= 0:
+                            break
+                await asyncio.sleep(min(delay, ASYNC_POLL_SECONDS) if delay > 0 else ASYNC_POLL_SECONDS)
+        finally:
+            with self._condition:
+                self._leave(entry)
+        return self._record(priority, start)
+
+    def _leave(self, entry: tuple):
+        # Called holding the lock; lets the next waiter check whether it is now at the head of the queue
+        self._waiting.remove(entry)
+        heapq.heapify(self._waiting)
+        self._condition.notify_all()
+
+    def _record(self, priority: Priority, start: float) -> float:
+        waited = time.monotonic() - start
+        with self._condition:
+            self.requests[priority] += 1
+            self.wait_seconds[priority] += waited
+        metrics.observe("rag_scheduler_wait_seconds", waited, deployment=self.name, priority=priority.name.lower())
+        return waited
+
+    def _admission_delay(self, amounts: Dict[str, float], priority: Priority, now: float) -> float:
+        # Takes from every bucket and returns 0 if the request fits, otherwise returns how long to wait
+        delay = 0.0
+        for name, bucket in self._buckets.items():
+            bucket.refill(now)
+            floor = bucket.capacity * self.bulk_reserve if priority == Priority.BULK else 0.0
+            # A request larger than the bucket is let through once the bucket is full, leaving a debt
+            needed = min(amounts[name], bucket.capacity - floor) + floor
+            delay = max(delay, bucket.seconds_until(needed))
+        if delay <= 0:
+            for name, bucket in self._buckets.items():
+                bucket.level -= amounts[name]
+        return delay
+
+    def release(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the tokens bucket once the response reports actual usage."""
+        bucket = self._buckets.get("tokens")
+        if bucket is None or actual_tokens is None:
+            return
+        with self._condition:
+            bucket.level = min(bucket.capacity, bucket.level + estimated_tokens - actual_tokens)
+            self._condition.notify_all()
+
+    def penalize(self, seconds: float):
+        """Pause all requests for seconds, e.g. after a 429 with a retry-after header."""
+        with self._condition:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        stats = {"throttled": self.throttled}
+        for priority in Priority:
+            count = self.requests[priority]
+            stats[f"{priority.name.lower()}_requests"] = count
+            stats[f"{priority.name.lower()}_avg_wait_ms"] = 1000 * self.wait_seconds[priority] / count if count else 0.0
+        return stats
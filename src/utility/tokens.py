@@ -0,0 +1,70 @@
+from typing import Optional
+import threading
+
+# gpt-4.1 uses o200k_base; the text-embedding-3 models use cl100k_base
+CHAT_ENCODING = "o200k_base"
+EMBEDDING_ENCODING = "cl100k_base"
+
+_encodings = {}
+_lock = threading.Lock()
+
+
+def _get_encoding(name: str):
+    # None when tiktoken is not installed or its encoding files can't be loaded (e.g. offline);
+    # the outcome is remembered so a failed download is only attempted once per process
+    if name not in _encodings:
+        with _lock:
+            if name not in _encodings:
+                try:
+                    import tiktoken
+                    _encodings[name] = tiktoken.get_encoding(name)
+                except Exception:
+                    _encodings[name] = None
+    return _encodings[name]
+
+
+def count_tokens(text: str, encoding: str = CHAT_ENCODING) -> int:
+    """
+    Count the tokens in a text with a local tokenizer.
+
+    Uses tiktoken when available, otherwise estimates about 4 characters per
+    token, which is close for English text.
+
+    Args:
+        text: Text to count
+        encoding: tiktoken encoding name
+
+    Returns:
+        Token count
+    """
+    tokenizer = _get_encoding(encoding)
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding: str = CHAT_ENCODING) -> Optional[str]:
+    """
+    Cut a text down to at most max_tokens tokens, at a word boundary.
+
+    Args:
+        text: Text to cut
+        max_tokens: Token limit
+        encoding: tiktoken encoding name
+
+    Returns:
+        The cut text, or None if not even one word fits
+    """
+    if count_tokens(text, encoding) <= max_tokens:
+        return text
+    # Binary search on the character length, then back off to the last space
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle], encoding) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    space = text.rfind(" ", 0, low + 1)
+    cut = text[:space if space > 0 else low].rstrip()
+    return cut or None
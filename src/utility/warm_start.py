@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, Optional
+
+from utility import component_registry, metrics
+from utility.tokens import CHAT_ENCODING, EMBEDDING_ENCODING, count_tokens
+
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+# Seconds each completed warm-start step took, in the order they ran
+timings: Dict[str, float] = {}
+
+
+def enabled() -> bool:
+    return os.getenv("RAG_WARM_START", "false").lower() == "true"
+
+
+def _open_chat_connection():
+    # Any HTTP response means the TLS connection is open and back in the shared pool
+    from openai import APIStatusError
+    try:
+        component_registry.get_chat_client().models.list()
+    except APIStatusError:
+        pass
+
+
+def _open_search_connection():
+    retrieval_manager = component_registry.get_retrieval_manager()
+    for search_client in (retrieval_manager.search_clients or {"": retrieval_manager.search_client}).values():
+        search_client.get_document_count()
+
+
+def _load_tokenizers():
+    count_tokens("", CHAT_ENCODING)
+    count_tokens("", EMBEDDING_ENCODING)
+
+
+# Cheap local steps first, so a slow or unreachable service delays nothing else
+STEPS: Dict[str, Callable[[], object]] = {
+    "prompt": component_registry.get_rag_prompt,
+    "tokenizers": _load_tokenizers,
+    "retrieval_policy": component_registry.get_retrieval_policy,
+    "retrieval_manager": component_registry.get_retrieval_manager,
+    "chat_client": component_registry.get_chat_client,
+    "answer_cache": lambda: component_registry.get_answer_cache(
+        component_registry.get_retrieval_manager().generation_names
+    ),
+    "chat_connection": _open_chat_connection,
+    "search_connection": _open_search_connection,
+}
+
+
+def run() -> Dict[str, float]:
+    """
+    Build the process-wide components and open their connections now rather than on the first question.
+
+    A failing step is reported and skipped; the component is built again on
+    first use and raises there as it would without a warm start.
+
+    Returns:
+        Seconds each completed step took
+    """
+    for step, warm in STEPS.items():
+        start = time.perf_counter()
+        try:
+            warm()
+        except Exception as e:
+            print(f"Warm start step {step} failed: {e.__class__.__name__}: {e}")
+            continue
+        timings[step] = time.perf_counter() - start
+        metrics.observe("rag_warm_start_seconds", timings[step], step=step)
+    print("Warm start done: " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
+    return timings
+
+
+def start(background: bool = True, force: bool = False) -> Optional[threading.Thread]:
+    """
+    Warm up once per process when RAG_WARM_START=true (or force is set).
+
+    Args:
+        background: Run in a daemon thread so the caller, e.g. the UI, is not held up
+        force: Warm up regardless of RAG_WARM_START
+
+    Returns:
+        The warm-up thread, or None when warming up is disabled, already started or ran in the foreground
+    """
+    global _thread
+    if not (force or enabled()):
+        return None
+    with _lock:
+        if _thread is not None:
+            return None
+        _thread = threading.Thread(target=run, name="warm-start", daemon=True)
+    if not background:
+        # Marks the warm start as done without a second thread
+        run()
+        return None
+    _thread.start()
+    return _thread